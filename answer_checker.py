@@ -0,0 +1,91 @@
+"""
+Локальна перевірка відповідей мінігри перед зверненням до OpenAI
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Optional
+
+
+# Різні варіанти апострофа, які трапляються в українських текстах
+_APOSTROPHES = str.maketrans({
+    '\u2019': "'",  # ’
+    '\u2018': "'",  # ‘
+    '\u02bc': "'",  # ʼ
+    '\u02b9': "'",  # ʹ
+    '\u2032': "'",  # ′
+    '\u00b4': "'",  # ´
+    '`': "'",
+})
+# Лапки та тире зводимо до одного варіанту
+_QUOTES_AND_DASHES = str.maketrans({
+    '\u00ab': '"', '\u00bb': '"', '\u201e': '"', '\u201c': '"', '\u201d': '"',
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-', '\u2015': '-', '\u2212': '-',
+})
+_SPACES_BEFORE_PUNCT = re.compile(r'\s+([,.;:!?])')
+_PUNCT = re.compile(r"[^\w\s']")
+
+
+def normalize_answer(text: str) -> str:
+    """Нормалізує Unicode, апострофи, лапки, тире, пробіли та регістр; кінцева крапка не важлива"""
+    text = unicodedata.normalize('NFKC', text).translate(_APOSTROPHES).translate(_QUOTES_AND_DASHES)
+    text = _SPACES_BEFORE_PUNCT.sub(r'\1', ' '.join(text.split()).lower())
+    return text.rstrip(' .!')
+
+
+def strip_punctuation(text: str) -> str:
+    """Нормалізований текст без розділових знаків (тільки слова)"""
+    return ' '.join(_PUNCT.sub(' ', normalize_answer(text)).split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Схожість двох нормалізованих рядків від 0 до 1 (на основі різниці символів)"""
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class AnswerChecker:
+    """Вирішує точні та явно хибні відповіді локально, а неоднозначні залишає для LLM"""
+
+    def __init__(self, accept_threshold: float = 1.0, reject_threshold: float = 0.6) -> None:
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.local_accepts = 0
+        self.local_rejects = 0
+        self.llm_checks = 0
+
+    def check(self, answer: str, correct: str, original: str = '') -> Optional[bool]:
+        """True/False - рішення прийнято локально, None - потрібна перевірка через LLM"""
+        answer_norm = normalize_answer(answer)
+        correct_norm = normalize_answer(correct)
+
+        if answer_norm == correct_norm:
+            self.local_accepts += 1
+            return True
+
+        # Гравець просто повторив речення з помилками
+        if original and answer_norm == normalize_answer(original):
+            self.local_rejects += 1
+            return False
+
+        score = similarity(answer_norm, correct_norm)
+        if score >= self.accept_threshold:
+            self.local_accepts += 1
+            return True
+        # Слова зовсім інші - сенс речення змінено, LLM тут не потрібна
+        if score < self.reject_threshold and similarity(strip_punctuation(answer), strip_punctuation(correct)) < self.reject_threshold:
+            self.local_rejects += 1
+            return False
+
+        self.llm_checks += 1
+        return None
+
+    def stats(self) -> dict:
+        """Скільки відповідей вирішено локально і скільки пішло до LLM"""
+        total = self.local_accepts + self.local_rejects + self.llm_checks
+        return {
+            'local_accepts': self.local_accepts,
+            'local_rejects': self.local_rejects,
+            'llm_checks': self.llm_checks,
+            'llm_avoided_ratio': (total - self.llm_checks) / total if total else 0.0,
+        }
+
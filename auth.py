@@ -0,0 +1,128 @@
+"""
+Список дозволених користувачів: O(1) перевірка, завантаження з .env та файлу, гаряче перезавантаження
+"""
+import logging
+import os
+import re
+import time
+from typing import Dict, FrozenSet, Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def parse_user_ids(raw: str) -> FrozenSet[int]:
+    """Розбирає ID, розділені комами, пробілами або переносами рядків; '#' починає коментар"""
+    ids = set()
+    for line in raw.splitlines():
+        line = line.split('#', 1)[0]
+        ids.update(int(uid) for uid in _SEPARATORS.split(line) if uid)
+    return frozenset(ids)
+
+
+class Allowlist:
+    """
+    Дозволені користувачі у frozenset: перевірка - один пошук у хеш-таблиці.
+
+    ID з .env та з файлу об'єднуються. Файл перечитується, коли змінюється його mtime,
+    новий набір підміняє старий цілком, тому перевірки не бачать частково завантажений список.
+    Якщо файл задано, список завжди ввімкнено: поки файл не вдалося прочитати, доступ мають
+    тільки ID з .env, а порожній або зламаний файл при перезавантаженні не замінює попередній список.
+    Відмови логуються не частіше за denial_log_interval секунд для кожного користувача.
+    """
+
+    def __init__(
+        self,
+        env_ids: str = '',
+        path: Optional[str] = None,
+        denial_log_interval: float = 60.0,
+        max_tracked_denials: int = 10_000,
+    ) -> None:
+        self.path = path
+        self.denial_log_interval = denial_log_interval
+        self.max_tracked_denials = max_tracked_denials
+        self._env_ids = parse_user_ids(env_ids)
+        self._file_ids: FrozenSet[int] = frozenset()
+        self._file_mtime: Optional[float] = None
+        self._ids: FrozenSet[int] = self._env_ids
+        self._last_denial_log: Dict[int, float] = {}
+        self.allowed = 0
+        self.denied = 0
+        self.suppressed_logs = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        if path:
+            self.reload_if_changed()
+
+    @property
+    def enabled(self) -> bool:
+        """Без файлу порожній список означає, що доступ мають всі"""
+        return bool(self._ids) or bool(self.path)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def is_allowed(self, user_id: int) -> bool:
+        ids = self._ids
+        if user_id in ids or not (ids or self.path):
+            self.allowed += 1
+            return True
+        self.denied += 1
+        self._log_denial(user_id)
+        return False
+
+    def _log_denial(self, user_id: int) -> None:
+        now = time.monotonic()
+        last = self._last_denial_log.get(user_id)
+        if last is not None and now - last < self.denial_log_interval:
+            self.suppressed_logs += 1
+            return
+        if len(self._last_denial_log) >= self.max_tracked_denials:
+            self._last_denial_log.clear()
+        self._last_denial_log[user_id] = now
+        logger.warning(f"Користувач {user_id} не знайдено в списку дозволених ({len(self._ids)} ID)")
+
+    def replace(self, ids: Iterable[int]) -> None:
+        """Підміняє ID з файлу (ID з .env залишаються)"""
+        self._file_ids = frozenset(ids)
+        self._ids = self._env_ids | self._file_ids
+
+    def reload_if_changed(self) -> bool:
+        """Перечитує файл, якщо він змінився; при помилці залишає попередній список"""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._file_mtime:
+                return False
+            with open(self.path, encoding='utf-8') as f:
+                ids = parse_user_ids(f.read())
+            if not ids:
+                # Порожній файл найчастіше означає незавершений запис, а не намір закрити доступ всім
+                raise ValueError("файл не містить жодного ID")
+        except (OSError, ValueError) as e:
+            self.reload_errors += 1
+            logger.error(f"Не вдалося завантажити список дозволених користувачів з {self.path}: {e}")
+            return False
+        self._file_mtime = mtime
+        self.replace(ids)
+        self.reloads += 1
+        logger.info(f"Завантажено {len(ids)} дозволених користувачів з {self.path} (всього: {len(self._ids)})")
+        return True
+
+    async def reload_job(self, context) -> None:
+        """Callback для JobQueue"""
+        self.reload_if_changed()
+
+    def stats(self) -> dict:
+        """Розмір списку, дозволені/відхилені перевірки та перезавантаження"""
+        return {
+            'size': len(self._ids),
+            'allowed': self.allowed,
+            'denied': self.denied,
+            'suppressed_logs': self.suppressed_logs,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+        }
@@ -0,0 +1,346 @@
+"""
+Офлайн-бенчмарк обробників бота без Telegram та OpenAI.
+
+Запускає локальний stub OpenAI, підміняє запити до Telegram Bot API заглушкою та подає
+в Application синтетичні оновлення з заданою частотою. Звітує пропускну здатність,
+p50/p95/p99 затримки та час блокування циклу подій.
+
+Приклад:
+    python benchmark.py --scenario check_grammar --total 500 --rate 100 --openai-latency 0.3
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from telegram.request import BaseRequest
+
+from stub_openai import StubOpenAIServer
+
+
+SCENARIOS = ('check_grammar', 'button_callback', 'start_minigame', 'check_minigame_answer')
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Grammar Bot', 'username': 'grammar_bench_bot'}
+
+
+class StubTelegramRequest(BaseRequest):
+    """Заглушка Bot API: відповідає успіхом на всі методи з налаштовуваною затримкою"""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls = 0
+        self._message_ids = itertools.count(1000)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs) -> Tuple[int, bytes]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+
+        if api_method == 'getMe':
+            result = BOT_USER
+        elif api_method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            result = {
+                'message_id': int(params.get('message_id') or next(self._message_ids)),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+
+class LoopLagMonitor:
+    """Вимірює, наскільки цикл подій запізнюється з пробудженням (ознака блокуючого коду)"""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def openai_requests() -> int:
+    from metrics import OPENAI_LATENCY
+    return sum(OPENAI_LATENCY.count(*labels) for labels in list(OPENAI_LATENCY._values))
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Bench'},
+            'text': text,
+        },
+    }
+
+
+def make_callback_update(update_id: int, user_id: int, data: str) -> dict:
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'chat_instance': str(user_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Bench'},
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': 'Оберіть режим',
+            },
+        },
+    }
+
+
+def configure_environment(args) -> None:
+    """Налаштовує бота на stub-сервер; викликається до імпорту bot"""
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': '1:benchmark',
+        'OPENAI_API_KEY': 'benchmark',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{args.openai_port}/v1',
+        'ALLOWED_USER_IDS': '',
+        'PERSISTENCE_BACKEND': 'none',
+        'METRICS_PORT': '0',
+        'STREAMING_MODES': 'mode_full' if args.streaming else '',
+        'STREAM_EDIT_INTERVAL': str(args.stream_edit_interval),
+        # Ліміти не повинні впливати на вимірювання
+        'USER_RATE_LIMIT_PER_MINUTE': '1000000000',
+        'USER_RATE_LIMIT_BURST': '1000000000',
+        'OPENAI_RPM_LIMIT': '1000000000',
+        'OPENAI_TPM_LIMIT': '1000000000000',
+    })
+    if args.batch_size:
+        os.environ['GRAMMAR_BATCH_SIZE'] = str(args.batch_size)
+        os.environ['GRAMMAR_BATCH_WINDOW'] = str(args.batch_window)
+    if args.hedging:
+        os.environ['OPENAI_HEDGING'] = 'true'
+    if args.openai_concurrency:
+        os.environ['OPENAI_MAX_CONCURRENCY'] = str(args.openai_concurrency)
+
+
+def start_stub_in_thread(server: StubOpenAIServer) -> None:
+    """Stub працює в окремому потоці зі своїм циклом подій, щоб не спотворювати вимірювання"""
+    ready = threading.Event()
+
+    async def serve() -> None:
+        await server.start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait(5)
+
+
+async def run_scenario(args, scenario: str, application, telegram_request: StubTelegramRequest, base_user: int) -> dict:
+    import bot
+    from telegram import Update
+
+    update_ids = itertools.count(base_user)
+
+    async def process(payload: dict) -> None:
+        await application.process_update(Update.de_json(payload, application.bot))
+
+    # Підготовка: стан користувачів перед вимірюваними оновленнями
+    users = args.total if scenario == 'check_minigame_answer' else args.users
+    if scenario == 'check_grammar':
+        await asyncio.gather(*(process(make_callback_update(next(update_ids), base_user + u, args.mode)) for u in range(users)))
+    elif scenario == 'check_minigame_answer':
+        await bot.puzzle_pool.refill_all()
+        await asyncio.gather(*(process(make_callback_update(next(update_ids), base_user + u, 'level_easy')) for u in range(users)))
+    elif scenario == 'start_minigame' and args.prefill:
+        await bot.puzzle_pool.refill_all()
+
+    def make_update(i: int) -> dict:
+        user_id = base_user + i % users
+        if scenario == 'check_grammar':
+            text = f"{args.text} ({i})" if args.unique_texts else args.text
+            return make_message_update(next(update_ids), user_id, text)
+        if scenario == 'button_callback':
+            return make_callback_update(next(update_ids), user_id, 'mode_basic')
+        if scenario == 'start_minigame':
+            return make_callback_update(next(update_ids), user_id, 'level_easy')
+        # Половина відповідей - точний збіг (вирішується локально), половина відрізняється
+        # лише комою: такі відповіді неоднозначні і йдуть до LLM-судді
+        correct = application.user_data[user_id].minigame_correct_answer or 'це правильне речення номер 0.'
+        answer = correct if i % 2 else correct.replace(' ', ', ', 1)
+        return make_message_update(next(update_ids), user_id, answer)
+
+    latencies: List[float] = []
+    errors_before = sum(bot.ERRORS._values.values())
+
+    async def timed(payload: dict) -> None:
+        started = time.perf_counter()
+        await process(payload)
+        latencies.append(time.perf_counter() - started)
+
+    calls_before = telegram_request.calls
+    openai_before = openai_requests()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.total):
+        tasks.append(asyncio.create_task(timed(make_update(i))))
+        if args.rate > 0:
+            await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    result = {
+        'scenario': scenario,
+        'updates': args.total,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(args.total / elapsed, 1),
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'loop_lag_max_ms': round(max(monitor.lags, default=0.0) * 1000, 1),
+        'loop_lag_p99_ms': round(percentile(monitor.lags, 0.99) * 1000, 1),
+        'loop_blocked_ms': round(sum(lag for lag in monitor.lags if lag > 0.005) * 1000, 1),
+        'errors': int(sum(bot.ERRORS._values.values()) - errors_before),
+        'telegram_calls': telegram_request.calls - calls_before,
+        'openai_requests': openai_requests() - openai_before,
+    }
+    return result
+
+
+async def run_all(args, scenarios) -> List[dict]:
+    import logging
+
+    import bot
+    from telegram.ext import Application
+
+    # Логи кожного запиту спотворюють вимірювання блокування циклу подій
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    telegram_request = StubTelegramRequest(args.telegram_latency)
+    application = (
+        Application.builder()
+        .token(os.environ['TELEGRAM_BOT_TOKEN'])
+        .context_types(bot.CONTEXT_TYPES)
+        .request(telegram_request)
+        .get_updates_request(StubTelegramRequest())
+        .updater(None)
+        .build()
+    )
+    bot.add_handlers(application)
+    # Клієнт OpenAI створюється ліниво; не враховуємо імпорт openai у затримці першого запиту
+    bot.openai_pool.warm_up()
+    await application.initialize()
+    await application.start()
+    try:
+        # Кожен сценарій отримує власний діапазон id користувачів, щоб стани не перетиналися
+        return [
+            await run_scenario(args, scenario, application, telegram_request, 100000 * (index + 1))
+            for index, scenario in enumerate(scenarios)
+        ]
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+
+def print_report(result: dict) -> None:
+    print(f"Сценарій: {result['scenario']}")
+    print(f"  Оновлень: {result['updates']} за {result['elapsed_seconds']}с "
+          f"({result['throughput_per_second']} оновлень/с)")
+    print(f"  Затримка: p50 {result['latency_p50_ms']}мс, p95 {result['latency_p95_ms']}мс, "
+          f"p99 {result['latency_p99_ms']}мс")
+    print(f"  Блокування циклу подій: максимум {result['loop_lag_max_ms']}мс, "
+          f"p99 {result['loop_lag_p99_ms']}мс, всього {result['loop_blocked_ms']}мс")
+    print(f"  Помилок: {result['errors']}, викликів Telegram API: {result['telegram_calls']}, "
+          f"запитів до OpenAI: {result['openai_requests']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--total', type=int, default=200, help='кількість вимірюваних оновлень')
+    parser.add_argument('--rate', type=float, default=0, help='оновлень за секунду (0 - всі одразу)')
+    parser.add_argument('--users', type=int, default=50, help='кількість синтетичних користувачів')
+    parser.add_argument('--mode', default='mode_simple', help='режим перевірки для check_grammar')
+    parser.add_argument('--text', default='Привіт, як в тебе справи? Я сьогодні йду до школи.')
+    parser.add_argument('--unique-texts', action=argparse.BooleanOptionalAction, default=True,
+                        help='унікальний текст у кожному оновленні (без попадань у кеш)')
+    parser.add_argument('--streaming', action='store_true', help='увімкнути стрімінг для mode_full')
+    parser.add_argument('--stream-edit-interval', type=float, default=0.2)
+    parser.add_argument('--prefill', action=argparse.BooleanOptionalAction, default=True,
+                        help='заповнити пул завдань перед start_minigame')
+    parser.add_argument('--openai-port', type=int, default=8765)
+    parser.add_argument('--openai-latency', type=float, default=0.2)
+    parser.add_argument('--openai-per-char-latency', type=float, default=0.0)
+    parser.add_argument('--openai-error-rate', type=float, default=0.0, help='частка відповідей 429/500 від stub')
+    parser.add_argument('--openai-slow-rate', type=float, default=0.0, help='частка повільних відповідей stub')
+    parser.add_argument('--openai-slow-latency', type=float, default=2.0)
+    parser.add_argument('--hedging', action='store_true', help='увімкнути hedged-запити (OPENAI_HEDGING)')
+    parser.add_argument('--openai-concurrency', type=int, default=0, help='OPENAI_MAX_CONCURRENCY (0 - як у боті)')
+    parser.add_argument('--batch-size', type=int, default=0, help='GRAMMAR_BATCH_SIZE (0 - як у боті)')
+    parser.add_argument('--batch-window', type=float, default=0.05, help='GRAMMAR_BATCH_WINDOW у секундах')
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help='затримка заглушки Bot API')
+    parser.add_argument('--json', action='store_true', help='вивести результати як JSON')
+    args = parser.parse_args()
+
+    configure_environment(args)
+    start_stub_in_thread(StubOpenAIServer(
+        port=args.openai_port,
+        latency=args.openai_latency,
+        per_char_latency=args.openai_per_char_latency,
+        error_rate=args.openai_error_rate,
+        slow_rate=args.openai_slow_rate,
+        slow_latency=args.openai_slow_latency,
+    ))
+
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+    results = asyncio.run(run_all(args, scenarios))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            print_report(result)
+
+
+if __name__ == '__main__':
+    main()
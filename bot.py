@@ -1,12 +1,32 @@
-import os
+import json
+import asyncio
+import threading
+import time
 import logging
-from dotenv import load_dotenv
+import math
+from typing import Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from openai import OpenAI
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 
+from auth import Allowlist
+from config import ConfigError, load_config
+from openai_pool import OpenAIPool
+from prompts import PROMPTS
+from response_cache import ResponseCache
+from puzzle_pool import PuzzlePool
+from answer_checker import AnswerChecker
+from webhook_server import run_webhook, start_metrics_server
+from text_chunks import split_text, split_message
+from grammar_batcher import GrammarBatcher, parse_batch_results
+from rate_limiter import UserRateLimiter, GlobalRateLimiter, RateLimitExceeded
+from resilience import CircuitBreaker, CircuitOpenError
+from model_router import ModelRouter, RouteChoice, default_routes, parse_model_overrides
+from metrics import REGISTRY, ERRORS, STREAM_FIRST_TEXT, StageTimer, instrument, record_usage
+from update_processor import ChatOrderedUpdateProcessor
+from persistence import SQLitePersistence, RedisPersistence
+from session_store import CONTEXT_TYPES, GrammarMode, SessionContext, SessionEvictor
 
-load_dotenv()
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -15,46 +35,162 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-ALLOWED_USER_IDS = os.getenv('ALLOWED_USER_IDS', '')
+# Налаштування читаються один раз; токени перевіряються тільки при створенні застосунку
+config = load_config()
 
-# Перевірка наявності токенів
-if not TELEGRAM_BOT_TOKEN:
-    raise ValueError("TELEGRAM_BOT_TOKEN не знайдено в змінних оточення")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY не знайдено в змінних оточення")
+# Повідомлення при перевищенні лімітів
+USER_RATE_LIMIT_MESSAGE = "⏳ Забагато повідомлень. Зачекайте трохи і спробуйте ще раз."
+GLOBAL_RATE_LIMIT_MESSAGE = "⏳ Бот зараз перевантажений. Спробуйте, будь ласка, за хвилину."
+UPSTREAM_UNAVAILABLE_MESSAGE = "⚠️ Сервіс перевірки тимчасово недоступний. Спробуйте, будь ласка, за хвилину."
+
+# Бот обробляє тільки повідомлення та натискання кнопок
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# Максимальна довжина одного повідомлення Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Скільки разів повторювати фінальне редагування стрімінгу, якщо Telegram просить зачекати
+FINAL_EDIT_ATTEMPTS = 3
+
+# Список дозволених користувачів (з .env та файлу, файл перечитується при зміні)
+try:
+    allowlist = Allowlist(config.allowed_user_ids, config.allowed_user_ids_file, denial_log_interval=config.auth_denial_log_interval)
+except ValueError:
+    # Тільки щоб модуль імпортувався: config.validate() не дасть запустити бота з некоректним ALLOWED_USER_IDS
+    allowlist = Allowlist('', config.allowed_user_ids_file, denial_log_interval=config.auth_denial_log_interval)
+
+# Обмеження частоти: на кожного користувача та глобально під ліміти OpenAI
+user_rate_limiter = UserRateLimiter(
+    rate_per_minute=config.user_rate_limit_per_minute,
+    burst=config.user_rate_limit_burst,
+)
+global_rate_limiter = GlobalRateLimiter(
+    rpm=config.openai_rpm_limit,
+    tpm=config.openai_tpm_limit,
+    max_wait=config.rate_limit_max_wait,
+)
+
+# Пул запитів до OpenAI з обмеженням одночасних запитів (клієнт створюється при першому запиті)
+openai_pool = OpenAIPool(
+    api_key=config.openai_api_key,
+    max_concurrency=config.openai_max_concurrency,
+    timeout=config.openai_timeout,
+    base_url=config.openai_base_url,
+    rate_limiter=global_rate_limiter,
+    max_retries=config.openai_max_retries,
+    retry_base_delay=config.openai_retry_base_delay,
+    retry_max_delay=config.openai_retry_max_delay,
+    hedging=config.openai_hedging,
+    hedge_percentile=config.openai_hedge_percentile,
+    breaker=CircuitBreaker(config.circuit_failure_threshold, config.circuit_recovery_time),
+)
+
+# Кеш відповідей перевірки граматики (повторні фрази не потребують нового запиту)
+response_cache = ResponseCache(
+    max_entries=config.cache_max_entries,
+    max_bytes=config.cache_max_bytes,
+    ttl=config.cache_ttl,
+    db_path=config.cache_db_path,
+    db_max_entries=config.cache_db_max_entries,
+)
+
+# Локальна перевірка відповідей мінігри (LLM викликається тільки для неоднозначних випадків)
+answer_checker = AnswerChecker(
+    accept_threshold=config.minigame_accept_threshold,
+    reject_threshold=config.minigame_reject_threshold,
+)
+
+# Сесії користувачів, неактивні довше за SESSION_IDLE_TTL або понад SESSION_MAX_COUNT, видаляються
+session_evictor = SessionEvictor(idle_ttl=config.session_idle_ttl, max_sessions=config.session_max_count)
+
+# Модель, max_tokens та temperature для кожного типу запиту з переходом на резервну модель при деградації
+try:
+    model_overrides = parse_model_overrides(config.model_routes)
+except ValueError as e:
+    logger.error(f"Помилка при парсингу MODEL_ROUTES: {e}. Використовуються моделі за замовчуванням.")
+    model_overrides = {}
+model_router = ModelRouter(
+    default_routes(model_overrides),
+    fallback_model=config.fallback_model,
+    error_rate=config.model_router_error_rate,
+    latency_scale=config.model_router_latency_scale,
+    cooldown=config.model_router_cooldown,
+)
+
+
+def collect_component_stats():
+    """Віддає статистику кешу, лімітів, пулів та перевірки відповідей для /metrics"""
+    cache = response_cache.stats()
+    yield 'grammar_bot_cache_hits_total', 'counter', 'Попадання в кеш відповідей', {}, cache['hits']
+    yield 'grammar_bot_cache_misses_total', 'counter', 'Промахи кешу відповідей', {}, cache['misses']
+    yield 'grammar_bot_cache_evictions_total', 'counter', 'Витіснення з кешу відповідей', {}, cache['evictions']
+    yield 'grammar_bot_cache_entries', 'gauge', 'Записів у кеші відповідей', {}, cache['entries']
+    yield 'grammar_bot_cache_saved_tokens_total', 'counter', 'Токени, заощаджені завдяки кешу', {}, cache['saved_tokens']
+    yield 'grammar_bot_cache_db_pruned_total', 'counter', 'Записи, видалені з SQLite-кешу відповідей', {}, cache['db_pruned']
+    
+    users = user_rate_limiter.stats()
+    for outcome in ('allowed', 'rejected'):
+        yield 'grammar_bot_user_rate_limit_total', 'counter', 'Ліміт повідомлень користувачів', {'outcome': outcome}, users[outcome]
+    yield 'grammar_bot_user_rate_limit_tracked_users', 'gauge', 'Користувачів із активним лімітом', {}, users['tracked_users']
+    for outcome, value in global_rate_limiter.stats().items():
+        yield 'grammar_bot_global_rate_limit_total', 'counter', 'Глобальний ліміт запитів до OpenAI', {'outcome': outcome}, value
+    
+    auth = allowlist.stats()
+    yield 'grammar_bot_allowlist_size', 'gauge', 'Дозволених користувачів', {}, auth['size']
+    for outcome in ('allowed', 'denied'):
+        yield 'grammar_bot_auth_checks_total', 'counter', 'Перевірки доступу', {'outcome': outcome}, auth[outcome]
+    yield 'grammar_bot_allowlist_reloads_total', 'counter', 'Перезавантаження списку дозволених', {}, auth['reloads']
+    
+    pool_stats = openai_pool.stats()
+    yield 'grammar_bot_openai_in_flight', 'gauge', 'Запити до OpenAI у польоті', {}, pool_stats['in_flight']
+    for state in ('closed', 'open', 'half_open'):
+        yield 'grammar_bot_openai_circuit_state', 'gauge', 'Стан circuit breaker для OpenAI', {'state': state}, int(pool_stats['state'] == state)
+    yield 'grammar_bot_openai_circuit_opened_total', 'counter', 'Скільки разів circuit breaker відкривався', {}, pool_stats['opened']
+    yield 'grammar_bot_openai_circuit_rejected_total', 'counter', 'Запити, відхилені відкритим circuit breaker', {}, pool_stats['rejected']
+    
+    pool = puzzle_pool.stats()
+    for level, depth in pool['depth'].items():
+        yield 'grammar_bot_puzzle_pool_depth', 'gauge', 'Готових завдань у пулі мінігри', {'level': level}, depth
+    for level, seconds in pool['last_refill_seconds'].items():
+        yield 'grammar_bot_puzzle_pool_last_refill_seconds', 'gauge', 'Тривалість останнього поповнення пулу', {'level': level}, seconds
+    yield 'grammar_bot_puzzle_pool_hits_total', 'counter', 'Завдання, взяті з пулу', {}, pool['pool_hits']
+    yield 'grammar_bot_puzzle_pool_misses_total', 'counter', 'Завдання, згенеровані наживо', {}, pool['pool_misses']
+    
+    answers = answer_checker.stats()
+    for outcome in ('local_accepts', 'local_rejects', 'llm_checks'):
+        yield 'grammar_bot_minigame_answers_total', 'counter', 'Перевірки відповідей мінігри', {'outcome': outcome}, answers[outcome]
+    
+    sessions = session_evictor.stats()
+    yield 'grammar_bot_sessions', 'gauge', 'Сесії користувачів (на момент останньої перевірки)', {}, sessions['sessions']
+    for reason in ('idle', 'overflow'):
+        yield 'grammar_bot_sessions_evicted_total', 'counter', 'Видалені сесії користувачів', {'reason': reason}, sessions[f'evicted_{reason}']
+    
+    for route, stats in model_router.stats().items():
+        yield 'grammar_bot_route_requests_total', 'counter', 'Запити до OpenAI за маршрутом', {'route': route}, stats['requests']
+        yield 'grammar_bot_route_failures_total', 'counter', 'Невдалі запити до OpenAI за маршрутом', {'route': route}, stats['failures']
+        yield 'grammar_bot_route_fallback_requests_total', 'counter', 'Запити маршруту, надіслані резервній моделі', {'route': route}, stats['fallback_requests']
+        yield 'grammar_bot_route_tokens_total', 'counter', 'Токени OpenAI за маршрутом', {'route': route}, stats['tokens']
+        yield 'grammar_bot_route_truncated_total', 'counter', 'Відповіді маршруту, обрізані через max_tokens', {'route': route}, stats['truncated']
+        yield 'grammar_bot_route_fallback_active', 'gauge', 'Чи маршрут зараз використовує резервну модель', {'route': route}, int(stats['fallback'])
+    
+    if grammar_batcher is not None:
+        batches = grammar_batcher.stats()
+        yield 'grammar_bot_grammar_batches_total', 'counter', 'Пакетні запити перевірки граматики', {}, batches['batches']
+        yield 'grammar_bot_grammar_batched_items_total', 'counter', 'Тексти, перевірені у пакетах', {}, batches['batched_items']
+        yield 'grammar_bot_grammar_batch_fallbacks_total', 'counter', 'Пакети з некоректною відповіддю', {}, batches['fallbacks']
+        yield 'grammar_bot_grammar_batch_requests_saved_total', 'counter', 'Запити до OpenAI, заощаджені пакетуванням', {}, batches['requests_saved']
 
-# Парсинг списку дозволених користувачів
-ALLOWED_USER_IDS_LIST = []
-if ALLOWED_USER_IDS:
-    try:
-        ALLOWED_USER_IDS_LIST = [int(uid.strip()) for uid in ALLOWED_USER_IDS.split(',') if uid.strip()]
-        logger.info(f"Завантажено {len(ALLOWED_USER_IDS_LIST)} дозволених користувачів: {ALLOWED_USER_IDS_LIST}")
-    except ValueError as e:
-        logger.error(f"Помилка при парсингу ALLOWED_USER_IDS: {e}. Перевірте формат у .env файлі.")
-else:
-    logger.warning("ALLOWED_USER_IDS не встановлено. Бот буде доступний всім користувачам.")
 
-# Ініціалізація клієнта OpenAI
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+REGISTRY.register_collector(collect_component_stats)
 
 
 def is_user_authorized(user_id: int) -> bool:
-    """Перевіряє, чи користувач має доступ до бота"""
-    if not ALLOWED_USER_IDS_LIST:
-        # Якщо список порожній, доступ мають всі
-        logger.debug(f"ALLOWED_USER_IDS_LIST порожній, доступ дозволено для {user_id}")
-        return True
-    is_authorized = user_id in ALLOWED_USER_IDS_LIST
-    if not is_authorized:
-        logger.warning(f"Користувач {user_id} не знайдено в списку дозволених: {ALLOWED_USER_IDS_LIST}")
-    else:
-        logger.debug(f"Користувач {user_id} авторизований")
-    return is_authorized
+    """Перевіряє, чи користувач має доступ до бота (якщо список порожній, доступ мають всі)"""
+    return allowlist.is_allowed(user_id)
 
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+@instrument('start')
+async def start(update: Update, context: SessionContext) -> None:
     """Обробник команди /start"""
     user_id = update.effective_user.id
     
@@ -63,7 +199,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             "Вибачте, у вас немає доступу до цього бота.\n"
             "Зверніться до адміністратора для отримання доступу."
         )
-        logger.warning(f"Неавторизований користувач {user_id} спробував використати бота")
+        ERRORS.inc('start', 'unauthorized')
         return
     
     welcome_message = (
@@ -83,7 +219,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info(f"Користувач {user_id} виконав команду /start")
 
 
-async def myid(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+@instrument('myid')
+async def myid(update: Update, context: SessionContext) -> None:
     """Обробник команди /myid - показує User ID користувача"""
     user_id = update.effective_user.id
     username = update.effective_user.username or "не вказано"
@@ -100,7 +237,7 @@ async def myid(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     if not is_auth:
         message += f"Надайте цей ID адміністратору для отримання доступу до бота.\n"
-        message += f"Дозволені користувачі: {ALLOWED_USER_IDS_LIST if ALLOWED_USER_IDS_LIST else 'не встановлено (доступ мають всі)'}"
+        message += f"Дозволених користувачів: {len(allowlist)}"
     else:
         message += f"Ви маєте доступ до бота."
     
@@ -108,13 +245,29 @@ async def myid(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info(f"Користувач {user_id} запросив свій ID (авторизований: {is_auth})")
 
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+# Назви режимів та рівнів для повідомлень користувачу
+MODE_NAMES = {
+    'mode_simple': 'Просте перевірення без об\'яснення',
+    'mode_basic': 'Перевірення та тільки об\'яснення базових помилок',
+    'mode_full': 'Перевірення та об\'яснення базових помилок та граматичних'
+}
+
+LEVEL_NAMES = {
+    'easy': 'легкий',
+    'normal': 'середній',
+    'hard': 'важкий'
+}
+
+
+@instrument('button_callback')
+async def button_callback(update: Update, context: SessionContext) -> None:
     """Обробник натискань на кнопки"""
     query = update.callback_query
     user_id = query.from_user.id
     
     if not is_user_authorized(user_id):
         await query.answer("У вас немає доступу до цього бота.")
+        ERRORS.inc('button_callback', 'unauthorized')
         return
     
     callback_data = query.data
@@ -138,6 +291,12 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Обробка рівнів складності мінігри
     if callback_data.startswith("level_"):
         level = callback_data.split("_")[1]  # easy, normal, hard
+        # Кожне натискання може стати двома запитами до OpenAI (якщо пул порожній)
+        if not user_rate_limiter.try_acquire(user_id):
+            await query.answer(USER_RATE_LIMIT_MESSAGE)
+            logger.warning(f"Користувач {user_id} перевищив ліміт повідомлень")
+            ERRORS.inc('button_callback', 'user_rate_limit')
+            return
         await query.answer()
         await query.edit_message_text("🎮 Генерую завдання...")
         await start_minigame(update, context, level)
@@ -145,16 +304,11 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     # Обробка режимів перевірки граматики
     mode = callback_data
-    context.user_data['grammar_mode'] = mode
-    context.user_data['in_minigame'] = False  # Скидаємо режим мінігри
+    session = context.user_data
+    session.grammar_mode = GrammarMode.from_key(mode)
+    session.end_minigame()  # Скидаємо режим мінігри
     
-    mode_names = {
-        'mode_simple': 'Просте перевірення без об\'яснення',
-        'mode_basic': 'Перевірення та тільки об\'яснення базових помилок',
-        'mode_full': 'Перевірення та об\'яснення базових помилок та граматичних'
-    }
-    
-    mode_name = mode_names.get(mode, 'Невідомий режим')
+    mode_name = MODE_NAMES.get(mode, 'Невідомий режим')
     
     await query.answer(f"Обрано: {mode_name}")
     await query.edit_message_text(
@@ -164,21 +318,104 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     logger.info(f"Користувач {user_id} вибрав режим: {mode_name}")
 
 
-async def start_minigame(update: Update, context: ContextTypes.DEFAULT_TYPE, level: str) -> None:
+async def create_routed(choice: RouteChoice, template, usage_mode: Optional[str] = None, **kwargs):
+    """Запит до OpenAI з параметрами маршруту; затримку, токени та помилки враховує роутер"""
+    started = time.perf_counter()
+    try:
+        response = await openai_pool.create(
+            route=choice.route,
+            model=choice.model,
+            temperature=choice.temperature,
+            max_tokens=choice.max_tokens,
+            **kwargs
+        )
+    except (RateLimitExceeded, CircuitOpenError):
+        # Запит не дійшов до моделі - це не ознака її деградації
+        raise
+    except Exception:
+        model_router.record(choice, time.perf_counter() - started, ok=False)
+        raise
+    
+    tokens = response.usage.total_tokens if response.usage else 0
+    truncated = any(item.finish_reason == 'length' for item in response.choices)
+    model_router.record(choice, time.perf_counter() - started, tokens=tokens, truncated=truncated)
+    record_usage(usage_mode or choice.route, choice.model, response.usage)
+    template.record_usage(response.usage)
+    return response
+
+
+async def generate_minigame_puzzle(level: str) -> tuple:
+    """Генерує одне завдання наживо: правильне речення, потім речення з помилками"""
+    correct_template = PROMPTS.get(f'puzzle.correct.{level}', 'puzzle.correct.normal')
+    error_template = PROMPTS.get(f'puzzle.errors.{level}', 'puzzle.errors.normal')
+    
+    # Генеруємо правильне речення
+    correct_response = await create_routed(
+        model_router.route('puzzle'),
+        correct_template,
+        messages=correct_template.messages(),
+    )
+    correct_text = correct_response.choices[0].message.content.strip()
+    
+    # Додаємо помилки до правильного речення
+    error_response = await create_routed(
+        model_router.route('puzzle'),
+        error_template,
+        messages=error_template.messages(correct=correct_text),
+    )
+    text_with_errors = error_response.choices[0].message.content.strip()
+    return correct_text, text_with_errors
+
+
+async def generate_minigame_batch(level: str, count: int) -> list:
+    """Генерує кілька завдань одним запитом до OpenAI (для фонового поповнення пулу)"""
+    template = PROMPTS.get(f'puzzle.batch.{level}', 'puzzle.batch.normal')
+    
+    response = await create_routed(
+        model_router.route('puzzle', items=count),
+        template,
+        usage_mode='puzzle_batch',
+        messages=template.messages(count=count),
+        response_format={"type": "json_object"}
+    )
+    
+    try:
+        items = json.loads(response.choices[0].message.content)["puzzles"]
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Не вдалося розібрати пакет завдань мінігри (рівень: {level}): {e}")
+        return []
+    
+    puzzles = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        correct_text = str(item.get("correct", "")).strip()
+        text_with_errors = str(item.get("with_errors", "")).strip()
+        # Завдання без помилок або порожні речення пропускаємо
+        if correct_text and text_with_errors and correct_text != text_with_errors:
+            puzzles.append((correct_text, text_with_errors))
+    return puzzles[:count]
+
+
+# Пул готових завдань мінігри, який поповнюється у фоні
+puzzle_pool = PuzzlePool(
+    generate_minigame_batch,
+    low_water=config.puzzle_pool_low_water,
+    target=config.puzzle_pool_target,
+    batch_size=config.puzzle_batch_size,
+)
+
+
+async def start_minigame(update: Update, context: SessionContext, level: str) -> None:
     """Запуск мінігри з вибраним рівнем складності"""
     query = update.callback_query
     user_id = query.from_user.id
     
     # Встановлюємо режим мінігри
-    context.user_data['in_minigame'] = True
-    context.user_data['minigame_level'] = level
+    session = context.user_data
+    session.start_minigame(level)
     
-    level_names = {
-        'easy': 'легкий',
-        'normal': 'середній',
-        'hard': 'важкий'
-    }
-    level_name = level_names.get(level, level)
+    level_name = LEVEL_NAMES.get(level, level)
     
     # Пояснення гри
     game_explanation = (
@@ -190,62 +427,25 @@ async def start_minigame(update: Update, context: ContextTypes.DEFAULT_TYPE, lev
     
     await query.edit_message_text(game_explanation)
     
-    # Генеруємо текст з помилками
+    # Беремо готове завдання з пулу, а генеруємо наживо тільки якщо пул порожній
+    timer = StageTimer('start_minigame')
     try:
-        await query.message.chat.send_action(action="typing")
-        
-        # Визначаємо кількість помилок залежно від рівня
-        error_counts = {
-            'easy': '1 або 2 помилки',
-            'normal': '4 або 5 помилок',
-            'hard': '7 або 8 помилок'
-        }
-        error_count = error_counts.get(level, '4 або 5 помилок')
-        
-        # Генеруємо правильне речення через OpenAI
-        difficulty_prompts = {
-            'easy': 'Створи просте українське речення (5-8 слів). Речення має бути про щось звичайне (погода, їжа, навчання). Надай ТІЛЬКИ речення без помилок.',
-            'normal': 'Створи середнє українське речення (8-12 слів). Речення має бути про щось цікаве (подорож, хобі, робота). Надай ТІЛЬКИ речення без помилок.',
-            'hard': 'Створи складне українське речення (12-18 слів). Речення має бути про щось складне (наука, філософія, технології). Надай ТІЛЬКИ речення без помилок.'
-        }
-        
-        prompt = difficulty_prompts.get(level, difficulty_prompts['normal'])
-        
-        # Генеруємо правильне речення
-        correct_response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": "Ти створюєш правильні українські речення. Надай ТІЛЬКИ речення без помилок, без пояснень."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=200
-        )
-        
-        correct_text = correct_response.choices[0].message.content.strip()
-        
-        # Додаємо помилки до правильного речення
-        error_prompt = (
-            f"Візьми це правильне речення і додай до нього рівно {error_count} граматичних помилок "
-            f"(орфографічні помилки, помилки в пунктуації, граматичні помилки). "
-            f"Надай ТІЛЬКИ речення з помилками, без пояснень та без правильного варіанту."
-        )
+        puzzle = puzzle_pool.pop(level)
+        if puzzle is None:
+            await query.message.chat.send_action(action="typing")
+            puzzle = await generate_minigame_puzzle(level)
+        else:
+            logger.info(f"Завдання для користувача {user_id} взято з пулу (рівень: {level}, залишилось: {puzzle_pool.depth(level)})")
         
-        error_response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": "Ти додаєш граматичні помилки до правильного речення. Надай ТІЛЬКИ речення з помилками, без пояснень."},
-                {"role": "user", "content": f"{error_prompt}\n\nПравильне речення: {correct_text}"}
-            ],
-            temperature=0.8,
-            max_tokens=200
-        )
+        if puzzle_pool.needs_refill(level):
+            context.application.create_task(puzzle_pool.refill(level))
         
-        text_with_errors = error_response.choices[0].message.content.strip()
+        correct_text, text_with_errors = puzzle
+        timer.mark('puzzle')
         
         # Зберігаємо правильну відповідь
-        context.user_data['minigame_correct_answer'] = correct_text.lower().strip()
-        context.user_data['minigame_original'] = text_with_errors
+        session.minigame_correct_answer = correct_text.lower().strip()
+        session.minigame_original = text_with_errors
         
         # Відправляємо завдання
         task_message = (
@@ -254,33 +454,248 @@ async def start_minigame(update: Update, context: ContextTypes.DEFAULT_TYPE, lev
         )
         
         await query.message.reply_text(task_message)
+        timer.mark('reply')
         logger.info(f"Користувач {user_id} отримав завдання мінігри (рівень: {level})")
         
+    except RateLimitExceeded as e:
+        logger.warning(f"Запит користувача {user_id} відхилено глобальним лімітом: {e}")
+        ERRORS.inc('start_minigame', 'global_rate_limit')
+        # Завдання немає, тому гра не починається: інакше наступне повідомлення порівнювалося б з ''
+        session.end_minigame()
+        await query.message.reply_text(GLOBAL_RATE_LIMIT_MESSAGE)
+        
+    except CircuitOpenError as e:
+        logger.warning(f"Запит користувача {user_id} відхилено, OpenAI недоступний: {e}")
+        ERRORS.inc('start_minigame', 'circuit_open')
+        session.end_minigame()
+        await query.message.reply_text(UPSTREAM_UNAVAILABLE_MESSAGE)
+        
     except Exception as e:
         logger.error(f"Помилка при генерації завдання мінігри: {str(e)}", exc_info=True)
+        ERRORS.inc('start_minigame', 'exception')
+        session.end_minigame()
         error_message = "Вибачте, сталася помилка при генерації завдання. Спробуйте пізніше."
         await query.message.reply_text(error_message)
 
 
-async def check_grammar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def edit_streamed_message(message, text: str) -> bool:
+    """Редагує повідомлення під час стрімінгу; повертає False, якщо Telegram відхилив редагування"""
+    try:
+        await message.edit_text(text[:TELEGRAM_MESSAGE_LIMIT])
+        return True
+    except RetryAfter as e:
+        # Перевищено ліміт редагувань - пропускаємо цей крок, наступне редагування буде пізніше
+        logger.debug(f"Telegram просить зачекати {e.retry_after}с перед наступним редагуванням")
+        return False
+    except BadRequest as e:
+        if 'not modified' in str(e).lower():
+            return True
+        raise
+
+
+async def finish_streamed_message(update: Update, message, text: str) -> None:
+    """
+    Фінальне редагування стрімінгу: його не можна пропустити, тому при RetryAfter чекаємо
+    і повторюємо. Якщо редагування так і не вдалося, надсилаємо текст новим повідомленням.
+    """
+    for _ in range(FINAL_EDIT_ATTEMPTS):
+        try:
+            await message.edit_text(text)
+            return
+        except RetryAfter as e:
+            logger.info(f"Telegram просить зачекати {e.retry_after}с перед фінальним редагуванням")
+            await asyncio.sleep(e.retry_after)
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return
+            logger.warning(f"Не вдалося відредагувати повідомлення: {e}")
+            break
+    await update.message.reply_text(text)
+
+
+async def stream_reply(update: Update, choice: RouteChoice, template, **kwargs) -> tuple:
+    """Стрімить відповідь OpenAI у повідомлення-заглушку, поступово редагуючи його"""
+    mode = choice.route
+    started = time.monotonic()
+    placeholder = await update.message.reply_text("✍️ Перевіряю...")
+    
+    text = ''
+    shown = ''
+    tokens = 0
+    truncated = False
+    last_edit = 0.0
+    first_visible = None
+    
+    stream = openai_pool.stream(
+        stream_options={"include_usage": True},
+        model=choice.model,
+        temperature=choice.temperature,
+        max_tokens=choice.max_tokens,
+        **kwargs
+    )
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                tokens = chunk.usage.total_tokens
+                record_usage(mode, choice.model, chunk.usage)
+                template.record_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].finish_reason == 'length':
+                truncated = True
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            text += chunk.choices[0].delta.content
+            
+            # Об'єднуємо редагування, щоб не перевищувати ліміти Telegram
+            now = time.monotonic()
+            if text.strip() and now - last_edit >= config.stream_edit_interval:
+                last_edit = now
+                if await edit_streamed_message(placeholder, text):
+                    shown = text
+                    if first_visible is None:
+                        first_visible = now - started
+    except (RateLimitExceeded, CircuitOpenError, TelegramError):
+        # Помилки лімітів та Telegram не свідчать про деградацію моделі
+        raise
+    except Exception:
+        model_router.record(choice, time.monotonic() - started, ok=False)
+        raise
+    model_router.record(choice, time.monotonic() - started, tokens=tokens, truncated=truncated)
+    
+    # Фінальне редагування після завершення відповіді; те, що не вмістилося, надсилаємо окремо
+    parts = split_message(text, TELEGRAM_MESSAGE_LIMIT) or [text]
+    if parts[0] != shown:
+        await finish_streamed_message(update, placeholder, parts[0])
+    for part in parts[1:]:
+        await update.message.reply_text(part)
+    if first_visible is None:
+        first_visible = time.monotonic() - started
+    STREAM_FIRST_TEXT.observe(first_visible, mode)
+    
+    logger.info(
+        f"Стрімінг завершено (перший текст через {first_visible:.2f}с, "
+        f"загалом {time.monotonic() - started:.2f}с)"
+    )
+    return text, tokens
+
+
+async def request_text_check(mode: str, text: str) -> tuple:
+    """Один запит перевірки граматики до OpenAI; повертає (виправлений текст, токени)"""
+    template = PROMPTS.get(f'grammar.{mode}', 'grammar.mode_simple')
+    response = await create_routed(
+        model_router.route(mode, chars=len(text)),
+        template,
+        messages=template.messages(text=text),
+    )
+    
+    # Отримання відповіді від OpenAI
+    corrected_text = response.choices[0].message.content
+    tokens = response.usage.total_tokens if response.usage else 0
+    return corrected_text, tokens
+
+
+async def request_simple_batch(texts: list) -> list:
+    """Перевіряє кілька текстів режиму mode_simple одним запитом зі структурованою відповіддю"""
+    items = [{"id": index, "text": text} for index, text in enumerate(texts)]
+    template = PROMPTS['grammar.batch']
+    response = await create_routed(
+        model_router.route('mode_simple', chars=sum(len(text) for text in texts), items=len(texts)),
+        template,
+        usage_mode='mode_simple_batch',
+        messages=template.messages(items=json.dumps({"items": items}, ensure_ascii=False)),
+        response_format={"type": "json_object"}
+    )
+    
+    corrected = parse_batch_results(response.choices[0].message.content, len(texts))
+    
+    # Токени пакета розподіляються між текстами для статистики кешу
+    tokens = (response.usage.total_tokens if response.usage else 0) // len(texts)
+    return [(text, tokens) for text in corrected]
+
+
+async def request_simple_check(text: str) -> tuple:
+    return await request_text_check('mode_simple', text)
+
+
+# Пакетування коротких перевірок mode_simple (вимкнено, якщо GRAMMAR_BATCH_SIZE <= 1)
+grammar_batcher = GrammarBatcher(
+    request_simple_batch,
+    request_simple_check,
+    max_batch_size=config.grammar_batch_size,
+    max_wait=config.grammar_batch_window,
+) if config.grammar_batch_size > 1 else None
+
+
+def is_batchable(mode: str, chunks: list) -> bool:
+    """
+    Пакетуються тільки короткі повідомлення mode_simple з однієї частини: частини довгого
+    тексту перевіряються паралельно окремими запитами, а в пакеті стали б одним довгим запитом
+    """
+    return (
+        grammar_batcher is not None
+        and mode == 'mode_simple'
+        and len(chunks) == 1
+        and len(chunks[0].strip()) <= config.grammar_batch_max_chars
+    )
+
+
+async def check_text_chunk(mode: str, system_instruction: str, text: str, batch: bool = False) -> str:
+    """Перевіряє граматику одного фрагмента тексту, використовуючи кеш; batch - через пакетування"""
+    # Ключ кешу - за основною моделлю маршруту, щоб кеш не скидався при переході на резервну
+    cache_key = response_cache.make_key(mode, system_instruction, model_router.primary_model(mode), text)
+    corrected_text = await response_cache.get(cache_key)
+    if corrected_text is not None:
+        return corrected_text
+    
+    started = time.monotonic()
+    if batch:
+        corrected_text, tokens = await grammar_batcher.submit(text)
+    else:
+        corrected_text, tokens = await request_text_check(mode, text)
+    await response_cache.set(cache_key, corrected_text, tokens=tokens, latency=time.monotonic() - started)
+    return corrected_text
+
+
+def join_checked_chunks(mode: str, chunks: list, results: list) -> str:
+    """Збирає результати перевірки частин у початковому порядку"""
+    if mode == 'mode_simple':
+        # Виправлений текст зберігає відступи та переноси рядків оригіналу між частинами
+        return ''.join(
+            chunk[:len(chunk) - len(chunk.lstrip())] + result.strip() + chunk[len(chunk.rstrip()):]
+            for chunk, result in zip(chunks, results)
+        ).strip()
+    # У режимах з поясненнями кожна частина - окремий блок
+    return '\n\n'.join(result.strip() for result in results)
+
+
+@instrument('check_grammar')
+async def check_grammar(update: Update, context: SessionContext) -> None:
     """Обробник текстових повідомлень для перевірки граматики"""
     user_id = update.effective_user.id
+    timer = StageTimer('check_grammar')
     
     if not is_user_authorized(user_id):
         await update.message.reply_text(
             "Вибачте, у вас немає доступу до цього бота.\n"
             "Зверніться до адміністратора для отримання доступу."
         )
-        logger.warning(f"Неавторизований користувач {user_id} спробував використати бота")
+        ERRORS.inc('check_grammar', 'unauthorized')
+        return
+    
+    # Захист від флуду: кожне повідомлення може стати запитом до OpenAI
+    if not user_rate_limiter.try_acquire(user_id):
+        await update.message.reply_text(USER_RATE_LIMIT_MESSAGE)
+        logger.warning(f"Користувач {user_id} перевищив ліміт повідомлень")
+        ERRORS.inc('check_grammar', 'user_rate_limit')
         return
+    timer.mark('auth')
     
     # Перевірка, чи це відповідь у мінігрі
-    if context.user_data.get('in_minigame'):
+    if context.user_data.in_minigame:
         await check_minigame_answer(update, context)
         return
     
     # Перевірка, чи вибрано режим
-    mode = context.user_data.get('grammar_mode', 'mode_simple')
+    mode = context.user_data.grammar_mode.key
     
     user_text = update.message.text
     logger.info(f"Користувач {user_id} надіслав текст для перевірки (режим: {mode}): {user_text[:50]}...")
@@ -290,59 +705,90 @@ async def check_grammar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.chat.send_action(action="typing")
         
         # Формування інструкцій залежно від режиму
-        system_instructions = {
-            'mode_simple': "Перевір граматику тексту. Надай тільки виправлений варіант тексту без жодних пояснень та коментарів. Не додавай зайвих пояснень, тільки виправлений текст.",
-            'mode_basic': "Перевір граматику тексту. Надай виправлений варіант тексту та поясни тільки базові помилки (орфографічні помилки, помилки в пунктуації). Не пояснюй складні граматичні правила.",
-            'mode_full': "Перевір граматику тексту. Надай виправлений варіант тексту та детально поясни всі знайдені помилки - як базові (орфографічні, пунктуаційні), так і граматичні (синтаксис, морфологія). Надай повне пояснення кожної помилки."
-        }
+        template = PROMPTS.get(f'grammar.{mode}', 'grammar.mode_simple')
+        system_instruction = template.system
         
-        system_instruction = system_instructions.get(mode, system_instructions['mode_simple'])
+        chunks = [chunk for chunk in split_text(user_text, config.grammar_chunk_chars) if chunk.strip()]
         
-        response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": user_text}
-            ],
-            temperature=0.3,
-            max_tokens=1500
-        )
-        
-        # Отримання відповіді від OpenAI
-        corrected_text = response.choices[0].message.content
+        if len(chunks) == 1 and mode in config.streaming_modes:
+            cache_key = response_cache.make_key(mode, system_instruction, model_router.primary_model(mode), user_text)
+            corrected_text = await response_cache.get(cache_key)
+            if corrected_text is None:
+                # Показуємо відповідь поступово, по мірі генерації
+                started = time.monotonic()
+                corrected_text, tokens = await stream_reply(
+                    update,
+                    model_router.route(mode, chars=len(user_text)),
+                    template=template,
+                    messages=template.messages(text=user_text),
+                )
+                await response_cache.set(cache_key, corrected_text, tokens=tokens, latency=time.monotonic() - started)
+                parts = []
+            else:
+                parts = split_message(corrected_text, TELEGRAM_MESSAGE_LIMIT)
+        else:
+            # Довгий текст перевіряємо частинами паралельно
+            batch = is_batchable(mode, chunks)
+            results = await asyncio.gather(*(
+                check_text_chunk(mode, system_instruction, chunk.strip(), batch=batch) for chunk in chunks
+            ))
+            corrected_text = join_checked_chunks(mode, chunks, results)
+            parts = split_message(corrected_text, TELEGRAM_MESSAGE_LIMIT)
+            if len(chunks) > 1:
+                logger.info(f"Текст користувача {user_id} перевірено частинами: {len(chunks)}")
+        timer.mark('openai')
         
-        # Відправка результату користувачу
-        await update.message.reply_text(corrected_text)
+        # Відправка результату користувачу (довга відповідь - кількома повідомленнями)
+        for part in parts:
+            await update.message.reply_text(part)
+        timer.mark('reply')
         logger.info(f"Успішно перевірено граматику для користувача {user_id} (режим: {mode})")
         
+    except RateLimitExceeded as e:
+        logger.warning(f"Запит користувача {user_id} відхилено глобальним лімітом: {e}")
+        ERRORS.inc('check_grammar', 'global_rate_limit')
+        await update.message.reply_text(GLOBAL_RATE_LIMIT_MESSAGE)
+        
+    except CircuitOpenError as e:
+        logger.warning(f"Запит користувача {user_id} відхилено, OpenAI недоступний: {e}")
+        ERRORS.inc('check_grammar', 'circuit_open')
+        await update.message.reply_text(UPSTREAM_UNAVAILABLE_MESSAGE)
+        
     except Exception as e:
         logger.error(f"Помилка при перевірці граматики: {str(e)}", exc_info=True)
+        ERRORS.inc('check_grammar', 'exception')
         error_message = "Вибачте, сталася помилка при перевірці граматики. Спробуйте пізніше."
         await update.message.reply_text(error_message)
 
 
-async def check_minigame_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def check_minigame_answer(update: Update, context: SessionContext) -> None:
     """Перевірка відповіді в мінігрі"""
     user_id = update.effective_user.id
     user_answer = update.message.text.strip().lower()
-    correct_answer = context.user_data.get('minigame_correct_answer', '').lower()
+    session = context.user_data
+    correct_answer = (session.minigame_correct_answer or '').lower()
     
+    timer = StageTimer('check_minigame_answer')
     try:
-        await update.message.chat.send_action(action="typing")
-        
-        # Порівнюємо відповіді (з урахуванням варіантів написання)
-        # Використовуємо OpenAI для більш гнучкої перевірки
-        check_response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": "Ти перевіряєш чи дві речення мають однаковий сенс та правильну граматику. Відповідай тільки 'ТАК' або 'НІ' без пояснень."},
-                {"role": "user", "content": f"Правильна відповідь: {correct_answer}\nВідповідь гравця: {user_answer}\n\nЧи правильна відповідь гравця?"}
-            ],
-            temperature=0.1,
-            max_tokens=10
-        )
+        # Спочатку порівнюємо відповіді локально (точні та явно хибні відповіді)
+        is_correct = answer_checker.check(user_answer, correct_answer, session.minigame_original or '')
+        timer.mark('local_check')
         
-        is_correct = check_response.choices[0].message.content.strip().upper().startswith('ТАК')
+        if is_correct is None:
+            await update.message.chat.send_action(action="typing")
+            
+            # Неоднозначний випадок - використовуємо OpenAI для більш гнучкої перевірки
+            judge_template = PROMPTS['minigame.judge']
+            check_response = await create_routed(
+                model_router.route('judge'),
+                judge_template,
+                messages=judge_template.messages(correct=correct_answer, answer=user_answer),
+            )
+            
+            is_correct = check_response.choices[0].message.content.strip().upper().startswith('ТАК')
+            timer.mark('openai')
+        else:
+            logger.info(f"Відповідь користувача {user_id} у мінігрі перевірено локально (правильно: {is_correct})")
         
         if is_correct:
             message = (
@@ -350,7 +796,6 @@ async def check_minigame_answer(update: Update, context: ContextTypes.DEFAULT_TY
                 "Хочеш спробувати ще раз? Натисни /start та обери мінігру!"
             )
         else:
-            original_text = context.user_data.get('minigame_original', '')
             message = (
                 f"❌ Це не правильна відповідь.\n\n"
                 f"Правильна відповідь:\n{correct_answer.capitalize()}\n\n"
@@ -358,34 +803,178 @@ async def check_minigame_answer(update: Update, context: ContextTypes.DEFAULT_TY
             )
         
         # Скидаємо режим мінігри
-        context.user_data['in_minigame'] = False
-        context.user_data.pop('minigame_correct_answer', None)
-        context.user_data.pop('minigame_original', None)
-        context.user_data.pop('minigame_level', None)
+        session.end_minigame()
         
         await update.message.reply_text(message)
+        timer.mark('reply')
         logger.info(f"Користувач {user_id} відповів у мінігрі (правильно: {is_correct})")
         
+    except RateLimitExceeded as e:
+        logger.warning(f"Запит користувача {user_id} відхилено глобальним лімітом: {e}")
+        ERRORS.inc('check_minigame_answer', 'global_rate_limit')
+        await update.message.reply_text(GLOBAL_RATE_LIMIT_MESSAGE)
+        
+    except CircuitOpenError as e:
+        logger.warning(f"Запит користувача {user_id} відхилено, OpenAI недоступний: {e}")
+        ERRORS.inc('check_minigame_answer', 'circuit_open')
+        await update.message.reply_text(UPSTREAM_UNAVAILABLE_MESSAGE)
+        
     except Exception as e:
         logger.error(f"Помилка при перевірці відповіді мінігри: {str(e)}", exc_info=True)
+        ERRORS.inc('check_minigame_answer', 'exception')
         error_message = "Вибачте, сталася помилка при перевірці відповіді. Спробуйте ще раз."
         await update.message.reply_text(error_message)
 
 
-def main() -> None:
-    """Головна функція для запуску бота"""
-    # Створення додатку
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    
-    # Додавання обробників
+def build_persistence(shard: Optional[Tuple[int, int]] = None):
+    """Створює сховище стану користувачів відповідно до PERSISTENCE_BACKEND; shard - (воркер, кількість воркерів)"""
+    backend = config.persistence_backend.lower()
+    if backend == 'sqlite':
+        return SQLitePersistence(
+            config.persistence_path,
+            update_interval=config.persistence_update_interval,
+            minigame_ttl=config.minigame_ttl,
+            user_data_ttl=config.user_data_ttl,
+            shard=shard,
+        )
+    if backend == 'redis':
+        return RedisPersistence(
+            config.redis_url,
+            update_interval=config.persistence_update_interval,
+            minigame_ttl=config.minigame_ttl,
+            user_data_ttl=config.user_data_ttl,
+            shard=shard,
+        )
+    if backend not in ('', 'none', 'memory'):
+        logger.warning(f"Невідомий PERSISTENCE_BACKEND={config.persistence_backend}, стан зберігатиметься тільки в пам'яті")
+    return None
+
+
+async def expire_minigame_sessions_job(context: SessionContext) -> None:
+    """Прибирає покинуті сесії мінігри з пам'яті та зі сховища"""
+    now = time.time()
+    expired = [
+        user_id for user_id, session in context.application.user_data.items()
+        if session.expire_minigame(config.minigame_ttl, now)
+    ]
+    if expired:
+        context.application.mark_data_for_update_persistence(user_ids=expired)
+        logger.info(f"Видалено {len(expired)} покинутих сесій мінігри")
+
+
+def add_handlers(application: Application) -> None:
+    """Реєструє обробники команд, кнопок та текстових повідомлень"""
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("myid", myid))
     application.add_handler(CallbackQueryHandler(button_callback))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, check_grammar))
+
+
+async def start_metrics(application: Application) -> None:
+    """Запускає HTTP-сервер /metrics у циклі подій бота"""
+    start_metrics_server(config.metrics_port, config.metrics_listen)
+
+
+def build_application(updater: bool = True, worker: int = 0, workers: int = 1) -> Application:
+    """
+    Фабрика застосунку: перевіряє налаштування та створює Application з обробниками,
+    сховищем стану та фоновими задачами. Кидає ConfigError, якщо не задано токени.
+
+    worker, workers - номер воркера супервізора та їх кількість: ліміти OpenAI, пул завдань та
+    ліміт сесій діляться між воркерами, а кожен воркер завантажує тільки стан своїх користувачів.
+    """
+    config.validate()
+    if workers > 1:
+        # Ліміти OPENAI_RPM_LIMIT/OPENAI_TPM_LIMIT спільні для всього бота, а пул завдань -
+        # сумарний запас, тому кожен воркер отримує свою частку
+        global_rate_limiter.set_limits(config.openai_rpm_limit / workers, config.openai_tpm_limit / workers)
+        puzzle_pool.target = math.ceil(config.puzzle_pool_target / workers)
+        puzzle_pool.low_water = min(puzzle_pool.target, math.ceil(config.puzzle_pool_low_water / workers))
+        session_evictor.max_sessions = math.ceil(config.session_max_count / workers)
+    if len(allowlist):
+        logger.info(f"Завантажено {len(allowlist)} дозволених користувачів")
+    elif config.allowed_user_ids_file:
+        logger.warning(
+            f"Список дозволених користувачів порожній: файл {config.allowed_user_ids_file} не прочитано. "
+            f"Доступ закрито для всіх, доки файл не буде виправлено."
+        )
+    else:
+        logger.warning("ALLOWED_USER_IDS не встановлено. Бот буде доступний всім користувачам.")
+    
+    # Імпорт openai та створення клієнта займають помітний час, тому виконуються у фоні,
+    # поки бот підключається до Telegram, а не під час першого запиту користувача
+    threading.Thread(target=openai_pool.warm_up, name='openai-warm-up', daemon=True).start()
+    
+    # Оновлення різних чатів обробляються паралельно, одного чату - по черзі
+    builder = (
+        Application.builder()
+        .token(config.telegram_bot_token)
+        .context_types(CONTEXT_TYPES)
+        .concurrent_updates(ChatOrderedUpdateProcessor(config.concurrent_updates))
+    )
+    if config.telegram_api_base_url:
+        builder = builder.base_url(config.telegram_api_base_url)
+    persistence = build_persistence((worker, workers) if workers > 1 else None)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if not updater:
+        # Оновлення приймає webhook-сервер або супервізор, Updater не потрібен
+        builder = builder.updater(None)
+    application = builder.build()
+    
+    # Додавання обробників
+    add_handlers(application)
+    
+    # Фонове поповнення пулу завдань мінігри
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(puzzle_pool.refill_job, interval=config.puzzle_refill_interval, first=1)
+        if config.minigame_ttl > 0:
+            application.job_queue.run_repeating(expire_minigame_sessions_job, interval=min(config.minigame_ttl, 300), first=config.minigame_ttl)
+        if config.session_idle_ttl > 0 or config.session_max_count > 0:
+            application.job_queue.run_repeating(session_evictor.evict_job, interval=60, first=60)
+        if config.allowed_user_ids_file:
+            application.job_queue.run_repeating(allowlist.reload_job, interval=config.allowed_user_ids_reload_interval, first=config.allowed_user_ids_reload_interval)
+    else:
+        logger.warning("JobQueue недоступна, пул завдань мінігри поповнюватиметься тільки за потреби")
+    return application
+
+
+def main() -> None:
+    """Головна функція для запуску бота"""
+    try:
+        config.validate()
+    except ConfigError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+    
+    if config.workers > 1:
+        # Багатопроцесний режим: супервізор розподіляє оновлення між воркерами за chat_id
+        from supervisor import run_supervisor
+        run_supervisor(config.workers)
+        return
+    
+    application = build_application(updater=not config.webhook_url)
+    if config.metrics_port:
+        # /metrics слухає METRICS_LISTEN і в режимі webhook, а не публічний webhook-сервер
+        application.post_init = start_metrics
     
     # Запуск бота
-    logger.info("Бот запущено...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info(
+        f"Бот запущено (одночасних оновлень: {config.concurrent_updates}, "
+        f"запитів до OpenAI: {config.openai_max_concurrency})..."
+    )
+    if config.webhook_url:
+        asyncio.run(run_webhook(
+            application,
+            url=config.webhook_url,
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            path=config.webhook_path,
+            secret_token=config.webhook_secret_token,
+            allowed_updates=ALLOWED_UPDATES,
+        ))
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+"""
+Налаштування бота зі змінних оточення (та файлу .env) в одному незмінному об'єкті.
+
+Модуль не імпортує telegram та openai і не перевіряє токени під час читання, тому
+конфігурацію та обробники можна імпортувати в тестах без справжніх токенів.
+"""
+import os
+import re
+from dataclasses import dataclass, fields
+from typing import FrozenSet, Mapping, Optional
+
+from auth import parse_user_ids
+
+
+class ConfigError(ValueError):
+    """Обов'язкова змінна оточення відсутня або має некоректне значення"""
+
+
+def parse_bool(value: str) -> bool:
+    return value.strip().lower() in ('1', 'true', 'yes')
+
+
+def parse_modes(value: str) -> FrozenSet[str]:
+    """Список режимів через кому, наприклад 'mode_basic,mode_full'"""
+    return frozenset(mode.strip() for mode in value.split(',') if mode.strip())
+
+
+def _optional_str(value: str) -> Optional[str]:
+    # Порожнє значення в .env означає "не задано"
+    return value or None
+
+
+# Telegram приймає секретний токен webhook довжиною 1-256 символів з A-Z, a-z, 0-9, _ та -
+_WEBHOOK_SECRET_TOKEN = re.compile(r'[A-Za-z0-9_-]{1,256}')
+
+_PARSERS = {
+    str: str,
+    int: int,
+    float: float,
+    bool: parse_bool,
+    Optional[str]: _optional_str,
+    FrozenSet[str]: parse_modes,
+}
+
+
+@dataclass(frozen=True)
+class Config:
+    """Кожне поле читається зі змінної оточення з такою ж назвою у верхньому регістрі"""
+
+    telegram_bot_token: str = ''
+    openai_api_key: str = ''
+    allowed_user_ids: str = ''
+    allowed_user_ids_file: Optional[str] = None
+    allowed_user_ids_reload_interval: float = 30.0
+    auth_denial_log_interval: float = 60.0
+    openai_base_url: Optional[str] = None
+    openai_max_concurrency: int = 16
+    openai_timeout: float = 30.0
+    concurrent_updates: int = 64
+    workers: int = 1
+    telegram_api_base_url: Optional[str] = None
+    cache_max_entries: int = 1000
+    cache_max_bytes: int = 5_000_000
+    cache_ttl: float = 86400.0
+    cache_db_path: Optional[str] = None
+    cache_db_max_entries: int = 100000
+    puzzle_pool_low_water: int = 3
+    puzzle_pool_target: int = 8
+    puzzle_batch_size: int = 4
+    puzzle_refill_interval: float = 30.0
+    minigame_accept_threshold: float = 1.0
+    minigame_reject_threshold: float = 0.6
+    streaming_modes: FrozenSet[str] = frozenset({'mode_full'})
+    stream_edit_interval: float = 1.0
+    grammar_chunk_chars: int = 1000
+    grammar_batch_size: int = 1
+    grammar_batch_window: float = 0.05
+    grammar_batch_max_chars: int = 300
+    webhook_url: Optional[str] = None
+    webhook_listen: str = '0.0.0.0'
+    webhook_port: int = 8443
+    webhook_path: str = '/telegram'
+    webhook_secret_token: Optional[str] = None
+    persistence_backend: str = 'sqlite'
+    persistence_path: str = 'bot_state.sqlite3'
+    redis_url: str = 'redis://localhost:6379/0'
+    persistence_update_interval: float = 10.0
+    minigame_ttl: float = 3600.0
+    user_data_ttl: float = 0.0
+    session_idle_ttl: float = 2592000.0
+    session_max_count: int = 100000
+    user_rate_limit_per_minute: float = 10.0
+    user_rate_limit_burst: int = 5
+    openai_rpm_limit: float = 500.0
+    openai_tpm_limit: float = 200000.0
+    rate_limit_max_wait: float = 5.0
+    openai_max_retries: int = 3
+    openai_retry_base_delay: float = 0.5
+    openai_retry_max_delay: float = 8.0
+    openai_hedging: bool = False
+    openai_hedge_percentile: float = 0.95
+    circuit_failure_threshold: int = 5
+    circuit_recovery_time: float = 30.0
+    model_routes: str = ''
+    fallback_model: Optional[str] = 'gpt-4o-mini'
+    model_router_error_rate: float = 0.2
+    model_router_latency_scale: float = 1.0
+    model_router_cooldown: float = 60.0
+    metrics_port: int = 0
+    metrics_listen: str = '127.0.0.1'
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> 'Config':
+        """Будує конфігурацію зі змінних оточення; незадані змінні отримують значення за замовчуванням"""
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            name = field.name.upper()
+            raw = environ.get(name)
+            if raw is None:
+                continue
+            try:
+                values[field.name] = _PARSERS[field.type](raw)
+            except ValueError:
+                raise ConfigError(f"Некоректне значення {name}={raw!r}") from None
+        return cls(**values)
+
+    def validate(self) -> None:
+        """Перевіряє, що задано все необхідне для запуску бота"""
+        if not self.telegram_bot_token:
+            raise ConfigError("TELEGRAM_BOT_TOKEN не знайдено в змінних оточення")
+        if not self.openai_api_key:
+            raise ConfigError("OPENAI_API_KEY не знайдено в змінних оточення")
+        try:
+            parse_user_ids(self.allowed_user_ids)
+        except ValueError as e:
+            # Відкривати бота всім через помилку в списку не можна, тому не запускаємося зовсім
+            raise ConfigError(f"Помилка при парсингу ALLOWED_USER_IDS: {e}. Перевірте формат у .env файлі.") from None
+        if self.webhook_url:
+            # Без токена будь-хто може надіслати на webhook підроблені оновлення від імені будь-якого користувача
+            if not self.webhook_secret_token:
+                raise ConfigError("WEBHOOK_SECRET_TOKEN обов'язковий у режимі webhook (WEBHOOK_URL)")
+            if not _WEBHOOK_SECRET_TOKEN.fullmatch(self.webhook_secret_token):
+                raise ConfigError("WEBHOOK_SECRET_TOKEN може містити тільки A-Z, a-z, 0-9, _ та - (до 256 символів)")
+
+
+def load_config(dotenv: bool = True) -> Config:
+    """Читає .env (змінні оточення мають пріоритет) і повертає конфігурацію без перевірки токенів"""
+    if dotenv:
+        from dotenv import load_dotenv
+        load_dotenv()
+    return Config.from_env()
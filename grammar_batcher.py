@@ -0,0 +1,132 @@
+"""
+Мікро-пакетування коротких перевірок граматики в один запит до OpenAI
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Результат перевірки - (виправлений текст, витрачені токени)
+CheckResult = Tuple[str, int]
+BatchChecker = Callable[[List[str]], Awaitable[List[CheckResult]]]
+SingleChecker = Callable[[str], Awaitable[CheckResult]]
+
+
+class MalformedBatchError(ValueError):
+    """Відповідь на пакет не вдалося розібрати або вона не відповідає запиту"""
+
+
+def parse_batch_results(content: str, count: int) -> List[str]:
+    """
+    Розбирає JSON-відповідь {"results": [{"id": 0, "corrected": "..."}, ...]} на пакет з count текстів.
+    Кидає MalformedBatchError, якщо JSON некоректний або id не збігаються з запитом.
+    """
+    try:
+        results = json.loads(content)["results"]
+        corrected = {int(item["id"]): str(item["corrected"]) for item in results}
+    except (ValueError, KeyError, TypeError) as e:
+        raise MalformedBatchError(str(e)) from e
+    if set(corrected) != set(range(count)):
+        raise MalformedBatchError(f"id у відповіді не збігаються з запитом: {sorted(corrected)}")
+    return [corrected[index] for index in range(count)]
+
+
+class GrammarBatcher:
+    """
+    Збирає тексти протягом короткого вікна (або до max_batch_size) і перевіряє їх одним запитом.
+
+    Результати повертаються кожному обробнику окремо. Якщо check_batch кидає
+    MalformedBatchError, тексти пакета перевіряються поодинці через check_single.
+    """
+
+    def __init__(
+        self,
+        check_batch: BatchChecker,
+        check_single: SingleChecker,
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+    ) -> None:
+        self.check_batch = check_batch
+        self.check_single = check_single
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_items = 0
+        self.single_requests = 0
+        self.fallbacks = 0
+
+    async def submit(self, text: str) -> CheckResult:
+        """Додає текст до поточного пакета і чекає на його результат"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        if len(batch) == 1:
+            await self._run_single(*batch[0])
+            return
+
+        texts = [text for text, _ in batch]
+        try:
+            results = await self.check_batch(texts)
+            if len(results) != len(batch):
+                raise MalformedBatchError(f"очікувалось {len(batch)} результатів, отримано {len(results)}")
+        except MalformedBatchError as e:
+            self.fallbacks += 1
+            logger.warning(f"Некоректна відповідь на пакет з {len(batch)} текстів, перевіряємо поодинці: {e}")
+            await asyncio.gather(*(self._run_single(text, future) for text, future in batch))
+            return
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_single(self, text: str, future: asyncio.Future) -> None:
+        self.single_requests += 1
+        try:
+            result = await self.check_single(text)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """Кількість пакетів, перевірених у пакетах текстів та заощаджених запитів до OpenAI"""
+        return {
+            'batches': self.batches,
+            'batched_items': self.batched_items,
+            'single_requests': self.single_requests,
+            'fallbacks': self.fallbacks,
+            'requests_saved': self.batched_items - self.batches,
+            'average_batch_size': self.batched_items / self.batches if self.batches else 0.0,
+        }
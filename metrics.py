@@ -0,0 +1,221 @@
+"""
+Легкі метрики у форматі Prometheus: лічильники, гістограми та колектори статистики модулів
+"""
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+# Межі гістограм затримок у секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Колектор повертає рядки (назва, тип, опис, мітки, значення)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Counter:
+    """Лічильник, що тільки зростає; мітки передаються позиційно в порядку labelnames"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labelvalues, value in self._values.items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {value}')
+        return lines
+
+
+class Histogram:
+    """Гістограма з фіксованими межами; зберігає кількість у кожному кошику, суму та загальну кількість"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # мітки -> [кількості по кошиках..., +Inf, сума]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._values.get(labelvalues)
+        if series is None:
+            series = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labelvalues: str) -> '_Timer':
+        """Контекстний менеджер, що вимірює тривалість блоку"""
+        return _Timer(self, labelvalues)
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._values.get(labelvalues)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labelvalues, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {series[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[str, ...]) -> None:
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+
+class StageTimer:
+    """Вимірює етапи обробника: кожен mark() записує час від попередньої позначки"""
+
+    __slots__ = ('handler', 'last')
+
+    def __init__(self, handler: str) -> None:
+        self.handler = handler
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        HANDLER_STAGE_LATENCY.observe(now - self.last, self.handler, stage)
+        self.last = now
+
+
+class Registry:
+    """Збирає всі метрики та колектори і віддає їх у текстовому форматі Prometheus"""
+
+    def __init__(self) -> None:
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Колектор викликається під час кожного запиту /metrics, а не на гарячому шляху"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        described = set()
+        for collector in self._collectors:
+            for name, kind, documentation, labels, value in collector():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f'# HELP {name} {documentation}')
+                    lines.append(f'# TYPE {name} {kind}')
+                labelnames = tuple(labels)
+                lines.append(f'{name}{_format_labels(labelnames, tuple(labels[n] for n in labelnames))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    'grammar_bot_handler_seconds', 'Повний час обробки оновлення', ('handler',)
+))
+HANDLER_STAGE_LATENCY = REGISTRY.register(Histogram(
+    'grammar_bot_handler_stage_seconds', 'Час окремих етапів обробника (auth, openai, reply)', ('handler', 'stage')
+))
+REQUESTS = REGISTRY.register(Counter(
+    'grammar_bot_requests_total', 'Кількість оброблених оновлень', ('handler',)
+))
+ERRORS = REGISTRY.register(Counter(
+    'grammar_bot_errors_total', 'Кількість помилок в обробниках', ('handler', 'kind')
+))
+OPENAI_LATENCY = REGISTRY.register(Histogram(
+    'grammar_bot_openai_request_seconds', 'Тривалість запитів до OpenAI', ('model',)
+))
+OPENAI_RETRIES = REGISTRY.register(Counter(
+    'grammar_bot_openai_retries_total', 'Повтори запитів до OpenAI за типом помилки', ('model', 'error')
+))
+OPENAI_HEDGES = REGISTRY.register(Counter(
+    'grammar_bot_openai_hedges_total', 'Дублікати повільних запитів до OpenAI: надіслані та ті, що відповіли першими', ('model', 'outcome')
+))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    'grammar_bot_openai_tokens_total', 'Токени OpenAI з response.usage', ('mode', 'model', 'kind')
+))
+PROMPT_TOKENS = REGISTRY.register(Counter(
+    'grammar_bot_prompt_tokens_total', 'Токени промпта за шаблоном: всього та взяті з кешу провайдера', ('template', 'kind')
+))
+ROUTE_LATENCY = REGISTRY.register(Histogram(
+    'grammar_bot_route_seconds', 'Тривалість успішних запитів до OpenAI за маршрутом та моделлю', ('route', 'model')
+))
+ROUTE_SWITCHES = REGISTRY.register(Counter(
+    'grammar_bot_route_fallback_switches_total', 'Перемикання маршруту на резервну модель за причиною', ('route', 'reason')
+))
+STREAM_FIRST_TEXT = REGISTRY.register(Histogram(
+    'grammar_bot_stream_first_text_seconds', 'Час до першого видимого тексту при стрімінгу', ('mode',)
+))
+
+
+def record_usage(mode: str, model: str, usage) -> None:
+    """Додає токени з response.usage до лічильників для режиму та моделі"""
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(mode, model, 'prompt', amount=usage.prompt_tokens or 0)
+    OPENAI_TOKENS.inc(mode, model, 'completion', amount=usage.completion_tokens or 0)
+
+
+def instrument(handler_name: str):
+    """Декоратор обробника: рахує запити, неперехоплені помилки та повний час обробки"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            REQUESTS.inc(handler_name)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                ERRORS.inc(handler_name, 'unhandled')
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started, handler_name)
+        return wrapper
+    return decorator
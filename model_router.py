@@ -0,0 +1,225 @@
+"""
+Вибір моделі, max_tokens та temperature для кожного типу запиту до OpenAI.
+
+Маршрут описує задачу (режим перевірки граматики, генерація завдань мінігри, суддя мінігри):
+основну модель, температуру та бюджет токенів відповіді залежно від довжини тексту.
+Якщо на маршруті погіршується p95 затримки або частка помилок основної моделі, запити на
+cooldown секунд переходять на резервну модель, після чого основна знову отримує трафік.
+
+Повна недоступність OpenAI - справа circuit breaker у пулі; роутер реагує на часткову
+деградацію, коли запити ще проходять, але повільно або з частими помилками.
+"""
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from metrics import ROUTE_LATENCY, ROUTE_SWITCHES
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gpt-4.1-nano'
+
+
+class Route:
+    """
+    Параметри запитів одного типу. Бюджет відповіді: min_tokens плюс tokens_per_char на кожен
+    символ вхідного тексту, але не більше max_tokens (для пакетів - на кожен елемент).
+    """
+
+    __slots__ = ('name', 'model', 'temperature', 'max_tokens', 'min_tokens', 'tokens_per_char', 'slow_p95')
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        min_tokens: Optional[int] = None,
+        tokens_per_char: float = 0.0,
+        slow_p95: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.min_tokens = max_tokens if min_tokens is None else min_tokens
+        self.tokens_per_char = tokens_per_char
+        # p95 затримки основної моделі (с), після якого маршрут переходить на резервну; 0 - не перевіряти
+        self.slow_p95 = slow_p95
+
+    def tokens_for(self, chars: int = 0, items: int = 1) -> int:
+        return min(self.max_tokens * items, self.min_tokens * items + int(chars * self.tokens_per_char))
+
+
+class RouteChoice(NamedTuple):
+    route: str
+    model: str
+    max_tokens: int
+    temperature: float
+    fallback: bool
+
+
+def default_routes(models: Optional[Dict[str, str]] = None) -> Tuple[Route, ...]:
+    """Маршрути бота; models дозволяє замінити основну модель окремих маршрутів"""
+    models = models or {}
+    return (
+        # Виправлений текст приблизно такої ж довжини, як вхідний (близько 2 символів на токен)
+        Route('mode_simple', models.get('mode_simple', DEFAULT_MODEL), 0.3, 1500, 64, 0.75, slow_p95=5.0),
+        # Режими з поясненнями: пояснення може бути довшим за сам текст, тому мінімум не нижчий
+        # за колишній фіксований бюджет (1500), а довгі тексти отримують більше
+        Route('mode_basic', models.get('mode_basic', DEFAULT_MODEL), 0.3, 2048, 1024, 1.0, slow_p95=10.0),
+        Route('mode_full', models.get('mode_full', DEFAULT_MODEL), 0.3, 3000, 1500, 1.5, slow_p95=20.0),
+        Route('puzzle', models.get('puzzle', DEFAULT_MODEL), 0.8, 200, slow_p95=10.0),
+        # Суддя відповідає одним словом 'ТАК' або 'НІ'
+        Route('judge', models.get('judge', DEFAULT_MODEL), 0.1, 10, slow_p95=3.0),
+    )
+
+
+ROUTE_NAMES = tuple(route.name for route in default_routes())
+
+
+def parse_model_overrides(raw: str) -> Dict[str, str]:
+    """Розбирає 'mode_full=gpt-4.1-mini,judge=gpt-4.1-nano' у словник маршрут -> модель"""
+    overrides = {}
+    for part in raw.replace(';', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, model = part.partition('=')
+        name, model = name.strip(), model.strip()
+        if not sep or not model:
+            raise ValueError(f"очікується маршрут=модель, отримано {part!r}")
+        if name not in ROUTE_NAMES:
+            raise ValueError(f"невідомий маршрут {name!r} (доступні: {', '.join(ROUTE_NAMES)})")
+        overrides[name] = model
+    return overrides
+
+
+class _RouteState:
+    """Ковзне вікно останніх запитів основної моделі маршруту та лічильники для метрик"""
+
+    __slots__ = ('samples', 'degraded_until', 'requests', 'failures', 'fallback_requests', 'tokens', 'truncated')
+
+    def __init__(self, window: int) -> None:
+        # (тривалість, успіх) останніх запитів до основної моделі
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.degraded_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.fallback_requests = 0
+        self.tokens = 0
+        # Відповіді, обрізані через max_tokens (finish_reason == 'length')
+        self.truncated = 0
+
+
+class ModelRouter:
+    """Повертає параметри запиту для маршруту та перемикає його на резервну модель при деградації"""
+
+    def __init__(
+        self,
+        routes: Iterable[Route],
+        fallback_model: Optional[str] = None,
+        error_rate: float = 0.2,
+        latency_scale: float = 1.0,
+        cooldown: float = 60.0,
+        window: int = 50,
+        min_samples: int = 20,
+    ) -> None:
+        self.routes: Dict[str, Route] = {route.name: route for route in routes}
+        self.fallback_model = fallback_model
+        self.error_rate = error_rate
+        self.latency_scale = latency_scale
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self._states = {name: _RouteState(window) for name in self.routes}
+
+    def primary_model(self, name: str) -> str:
+        return self.routes[name].model
+
+    def route(self, name: str, chars: int = 0, items: int = 1) -> RouteChoice:
+        """Параметри запиту для маршруту name з урахуванням довжини тексту та стану основної моделі"""
+        route = self.routes[name]
+        fallback = self.is_degraded(name)
+        model = self.fallback_model if fallback else route.model
+        return RouteChoice(name, model, route.tokens_for(chars, items), route.temperature, fallback)
+
+    def is_degraded(self, name: str) -> bool:
+        if not self.fallback_model or self.fallback_model == self.routes[name].model:
+            return False
+        return time.monotonic() < self._states[name].degraded_until
+
+    def record(
+        self,
+        choice: RouteChoice,
+        seconds: float,
+        tokens: int = 0,
+        ok: bool = True,
+        truncated: bool = False,
+    ) -> None:
+        """
+        Враховує результат запиту; помилки лімітів та circuit breaker сюди не передаються.
+        truncated - відповідь обрізана через max_tokens; за цим лічильником підбираються бюджети маршрутів.
+        """
+        state = self._states[choice.route]
+        state.requests += 1
+        state.tokens += tokens
+        if truncated:
+            state.truncated += 1
+            logger.warning(
+                f"Маршрут {choice.route}: відповідь {choice.model} обрізана на max_tokens={choice.max_tokens}"
+            )
+        if ok:
+            ROUTE_LATENCY.observe(seconds, choice.route, choice.model)
+        else:
+            state.failures += 1
+        if choice.fallback:
+            state.fallback_requests += 1
+            return
+        if self.is_degraded(choice.route):
+            # Запит надіслано до перемикання; основну модель оцінимо заново після cooldown
+            return
+
+        state.samples.append((seconds, ok))
+        if len(state.samples) < self.min_samples:
+            return
+        reason = self._degradation_reason(self.routes[choice.route], state)
+        if reason is not None:
+            self._switch_to_fallback(choice.route, state, reason)
+
+    def _degradation_reason(self, route: Route, state: _RouteState) -> Optional[str]:
+        failures = sum(1 for _, ok in state.samples if not ok)
+        if failures / len(state.samples) > self.error_rate:
+            return 'errors'
+        threshold = route.slow_p95 * self.latency_scale
+        latencies = sorted(seconds for seconds, ok in state.samples if ok)
+        if threshold > 0 and latencies and latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] > threshold:
+            return 'latency'
+        return None
+
+    def _switch_to_fallback(self, name: str, state: _RouteState, reason: str) -> None:
+        # Після cooldown основна модель оцінюється заново, за свіжими запитами
+        state.samples.clear()
+        if not self.fallback_model or self.fallback_model == self.routes[name].model:
+            return
+        state.degraded_until = time.monotonic() + self.cooldown
+        ROUTE_SWITCHES.inc(name, reason)
+        logger.warning(
+            f"Маршрут {name}: модель {self.routes[name].model} деградувала ({reason}), "
+            f"запити йдуть на {self.fallback_model} наступні {self.cooldown:.0f}с"
+        )
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                'model': self.routes[name].model,
+                'fallback': self.is_degraded(name),
+                'requests': state.requests,
+                'failures': state.failures,
+                'fallback_requests': state.fallback_requests,
+                'tokens': state.tokens,
+                'truncated': state.truncated,
+            }
+            for name, state in self._states.items()
+        }
@@ -0,0 +1,215 @@
+"""
+Асинхронний пул запитів до OpenAI з обмеженням кількості одночасних запитів, повторами,
+hedged-запитами та circuit breaker
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from metrics import OPENAI_LATENCY, OPENAI_RETRIES, OPENAI_HEDGES
+from rate_limiter import GlobalRateLimiter, RateLimitExceeded
+from resilience import CircuitBreaker, LatencyTracker, backoff_delay, is_retryable, retry_after_seconds
+
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """Груба оцінка токенів запиту для TPM-ліміту: текст повідомлень плюс max_tokens"""
+    chars = sum(len(message.get('content') or '') for message in kwargs.get('messages', ()))
+    # Для української мови в середньому близько 2 символів на токен
+    return chars // 2 + kwargs.get('max_tokens', 0)
+
+
+def latency_key(model: str, route: Optional[str], max_tokens: int) -> str:
+    """
+    Ключ розподілу затримок для hedged-запитів: маршрут, модель та порядок max_tokens.
+    Відповідь судді на 10 токенів і пояснення на 1500 токенів мають зовсім різні затримки,
+    тому спільний перцентиль дублював би майже кожен довгий запит і ніколи - короткий.
+    """
+    return f"{route or '-'}/{model}/{max(1, max_tokens).bit_length()}"
+
+
+class OpenAIPool:
+    """
+    Обгортка над AsyncOpenAI, через яку проходять всі запити бота.
+
+    Обмежує кількість запитів у польоті та час кожного запиту, повторює запити при 429/5xx
+    з експоненційною затримкою (з урахуванням Retry-After), за потреби надсилає дублікат
+    запиту, якщо перший триває довше за перцентиль hedge_percentile, і швидко відмовляє,
+    поки circuit breaker вважає OpenAI недоступним.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 16,
+        timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[GlobalRateLimiter] = None,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+        hedging: bool = False,
+        hedge_percentile: float = 0.95,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """AsyncOpenAI створюється при першому зверненні: імпорт openai займає значну частину часу старту"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import AsyncOpenAI
+                    # Повтори виконує сам пул, щоб вони проходили через ліміти, метрики та circuit breaker
+                    self._client = AsyncOpenAI(
+                        api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0,
+                    )
+        return self._client
+
+    def warm_up(self) -> None:
+        """Завчасно створює клієнт (можна викликати з окремого потоку)"""
+        try:
+            self.client
+        except Exception as e:
+            logger.error(f"Не вдалося створити клієнт OpenAI: {e}")
+
+    async def create(self, route: Optional[str] = None, **kwargs):
+        """Виконує chat.completions.create, не блокуючи цикл подій; route - маршрут запиту для hedging"""
+        kwargs.setdefault('timeout', self.timeout)
+        model = kwargs.get('model', '')
+        key = latency_key(model, route, kwargs.get('max_tokens', 0))
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                response = await self._create_hedged(kwargs, key)
+            except Exception as e:
+                await self._before_retry(e, attempt, model)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return response
+
+    async def stream(self, **kwargs):
+        """Виконує chat.completions.create зі stream=True та віддає чанки по мірі надходження"""
+        kwargs.setdefault('timeout', self.timeout)
+        model = kwargs.get('model', '')
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            started_streaming = False
+            try:
+                async for chunk in self._stream_once(kwargs):
+                    started_streaming = True
+                    yield chunk
+            except Exception as e:
+                # Після першого чанка користувач уже бачить текст - повтор дав би дубльовану відповідь
+                if started_streaming:
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    raise
+                await self._before_retry(e, attempt, model)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return
+
+    async def _before_retry(self, error: Exception, attempt: int, model: str) -> None:
+        """Чекає перед повтором або перекидає помилку, якщо її не варто повторювати"""
+        if isinstance(error, RateLimitExceeded) or not is_retryable(error):
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise error
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None and retry_after > self.retry_max_delay:
+            raise error
+        delay = retry_after if retry_after is not None else backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+        OPENAI_RETRIES.inc(model, type(error).__name__)
+        logger.warning(
+            f"Запит до OpenAI не вдався ({type(error).__name__}), "
+            f"повтор {attempt + 1}/{self.max_retries} через {delay:.2f}с"
+        )
+        await asyncio.sleep(delay)
+
+    async def _create_hedged(self, kwargs: dict, key: str):
+        """Якщо запит триває довше за звичайний хвіст затримок схожих запитів, паралельно надсилає дублікат"""
+        model = kwargs.get('model', '')
+        hedge_after = self.latency.percentile(key, self.hedge_percentile) if self.hedging else None
+        if hedge_after is None:
+            return await self._create_once(kwargs, key)
+
+        primary = asyncio.ensure_future(self._create_once(kwargs, key))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        OPENAI_HEDGES.inc(model, 'sent')
+        hedge = asyncio.ensure_future(self._create_once(kwargs, key))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            OPENAI_HEDGES.inc(model, 'won')
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _create_once(self, kwargs: dict, key: str):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(estimate_tokens(kwargs))
+        model = kwargs.get('model', '')
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(**kwargs)
+            finally:
+                self.in_flight -= 1
+                OPENAI_LATENCY.observe(time.perf_counter() - started, model)
+            self.latency.record(key, time.perf_counter() - started)
+            return response
+
+    async def _stream_once(self, kwargs: dict):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(estimate_tokens(kwargs))
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(stream=True, **kwargs)
+                async for chunk in response:
+                    yield chunk
+            finally:
+                self.in_flight -= 1
+                OPENAI_LATENCY.observe(time.perf_counter() - started, kwargs.get('model', ''))
+
+    def stats(self) -> dict:
+        return {'in_flight': self.in_flight, **self.breaker.stats()}
@@ -0,0 +1,244 @@
+"""
+Постійне сховище стану користувачів (режим перевірки та сесії мінігри)
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from session_store import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindPersistence(BasePersistence):
+    """
+    Базова логіка для сховищ user_data.
+
+    Записи накопичуються в буфері та пишуться одним пакетом у фоні, тому обробники
+    не чекають на диск. Підкласи реалізують тільки _load_all та _write_batch і працюють
+    зі словниками з Session.to_dict().
+
+    shard = (номер воркера, кількість воркерів): воркер завантажує тільки своїх користувачів
+    (user_id % кількість == номер), так само як супервізор розподіляє оновлення.
+    """
+
+    def __init__(
+        self,
+        update_interval: float = 10,
+        minigame_ttl: float = 3600,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.minigame_ttl = minigame_ttl
+        self.shard = shard
+        # user_id -> дані (None означає видалення)
+        self._pending: Dict[int, Optional[dict]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+        self.rows_written = 0
+
+    def owns(self, user_id: int) -> bool:
+        """Чи належить користувач шарду цього воркера"""
+        return self.shard is None or user_id % self.shard[1] == self.shard[0]
+
+    async def _load_all(self) -> Dict[int, dict]:
+        """Повертає збережені дані користувачів цього шарду"""
+        raise NotImplementedError
+
+    async def _write_batch(self, batch: Dict[int, Optional[dict]]) -> None:
+        raise NotImplementedError
+
+    async def get_user_data(self) -> Dict[int, Session]:
+        user_data = {user_id: Session.from_dict(data) for user_id, data in (await self._load_all()).items()}
+        now = time.time()
+        expired = [user_id for user_id, session in user_data.items() if session.expire_minigame(self.minigame_ttl, now)]
+        for user_id in expired:
+            self._schedule(user_id, user_data[user_id])
+        logger.info(f"Завантажено стан {len(user_data)} користувачів (прострочених сесій мінігри: {len(expired)})")
+        return user_data
+
+    async def update_user_data(self, user_id: int, data: Session) -> None:
+        self._schedule(user_id, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._schedule(user_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Session) -> None:
+        # Перевіряємо TTL перед кожним оновленням, щоб користувач не потрапив у давно покинуту гру
+        user_data.expire_minigame(self.minigame_ttl)
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write_pending()
+
+    def _schedule(self, user_id: int, data: Optional[Session]) -> None:
+        self._pending[user_id] = None if data is None else data.to_dict()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        # Даємо Application додати в буфер решту користувачів поточного циклу
+        await asyncio.sleep(0)
+        try:
+            await self._write_pending()
+        except Exception as e:
+            logger.error(f"Помилка при записі стану користувачів: {str(e)}", exc_info=True)
+
+    async def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        await self._write_batch(batch)
+        self.batches_written += 1
+        self.rows_written += len(batch)
+
+    # Бот зберігає тільки user_data, решта методів BasePersistence не використовується
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+
+class SQLitePersistence(WriteBehindPersistence):
+    """Сховище user_data у файлі SQLite (працює без додаткових залежностей)"""
+
+    def __init__(
+        self,
+        path: str,
+        update_interval: float = 10,
+        minigame_ttl: float = 3600,
+        user_data_ttl: float = 0,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        super().__init__(update_interval=update_interval, minigame_ttl=minigame_ttl, shard=shard)
+        self.user_data_ttl = user_data_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL дозволяє кільком процесам читати базу, поки інший пише
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_data ("
+            "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _load_sync(self) -> Dict[int, dict]:
+        with self._lock:
+            if self.user_data_ttl > 0:
+                self._conn.execute("DELETE FROM user_data WHERE updated_at < ?", (time.time() - self.user_data_ttl,))
+                self._conn.commit()
+            rows = self._conn.execute("SELECT user_id, data FROM user_data").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows if self.owns(user_id)}
+
+    def _write_sync(self, batch: Dict[int, Optional[dict]]) -> None:
+        now = time.time()
+        updates = [(user_id, json.dumps(data, ensure_ascii=False), now) for user_id, data in batch.items() if data is not None]
+        deletes = [(user_id,) for user_id, data in batch.items() if data is None]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)", updates
+            )
+            self._conn.executemany("DELETE FROM user_data WHERE user_id = ?", deletes)
+            self._conn.commit()
+
+    async def _load_all(self) -> Dict[int, dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load_sync)
+
+    async def _write_batch(self, batch: Dict[int, Optional[dict]]) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_sync, batch)
+
+
+class RedisPersistence(WriteBehindPersistence):
+    """Сховище user_data у Redis (або сумісному сервері), спільне для кількох процесів"""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client=None,
+        prefix: str = 'grammar_bot:user:',
+        load_batch_size: int = 500,
+        update_interval: float = 10,
+        minigame_ttl: float = 3600,
+        user_data_ttl: float = 0,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        super().__init__(update_interval=update_interval, minigame_ttl=minigame_ttl, shard=shard)
+        if client is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                raise ImportError("Для PERSISTENCE_BACKEND=redis встановіть пакет redis: pip install redis")
+            client = redis_asyncio.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.user_data_ttl = user_data_ttl
+        self.load_batch_size = load_batch_size
+
+    async def _load_all(self) -> Dict[int, dict]:
+        keys = []
+        async for key in self.client.scan_iter(match=f"{self.prefix}*", count=self.load_batch_size):
+            key = key.decode() if isinstance(key, bytes) else key
+            if self.owns(int(key[len(self.prefix):])):
+                keys.append(key)
+        # Один MGET на пакет ключів замість окремого GET (і окремого round-trip) на кожного користувача
+        user_data = {}
+        for start in range(0, len(keys), self.load_batch_size):
+            batch = keys[start:start + self.load_batch_size]
+            for key, raw in zip(batch, await self.client.mget(batch)):
+                # Ключ міг зникнути між SCAN та MGET (EX або інший воркер)
+                if raw is not None:
+                    user_data[int(key[len(self.prefix):])] = json.loads(raw)
+        return user_data
+
+    async def _write_batch(self, batch: Dict[int, Optional[dict]]) -> None:
+        # Застарілі записи Redis видаляє сам через EX
+        expire = int(self.user_data_ttl) if self.user_data_ttl > 0 else None
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id, data in batch.items():
+                key = f"{self.prefix}{user_id}"
+                if data is None:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, json.dumps(data, ensure_ascii=False), ex=expire)
+            await pipe.execute()
@@ -0,0 +1,152 @@
+"""
+Реєстр шаблонів промптів: будуються один раз при старті, мають версії та рахують кешовані токени.
+
+Кожен запит складається так, щоб незмінна частина (системне повідомлення та статичний
+початок повідомлення користувача) була байт-у-байт однаковою між викликами, а змінні дані
+йшли в кінці. Тоді провайдер може повторно використати кеш префікса промпта.
+"""
+from typing import Dict, List
+
+from metrics import PROMPT_TOKENS
+
+
+class PromptTemplate:
+    """Системне повідомлення та шаблон повідомлення користувача (str.format) зі змінними в кінці"""
+
+    __slots__ = ('name', 'version', 'system', 'user_template', '_system_message', 'requests', 'prompt_tokens', 'cached_tokens')
+
+    def __init__(self, name: str, version: int, system: str, user_template: str = '{text}') -> None:
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user_template = user_template
+        self._system_message = {"role": "system", "content": system}
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @property
+    def key(self) -> str:
+        return f'{self.name}@v{self.version}'
+
+    def messages(self, **values) -> List[dict]:
+        return [self._system_message, {"role": "user", "content": self.user_template.format(**values)}]
+
+    def record_usage(self, usage) -> None:
+        """Рахує токени промпта та скільки з них взято з кешу провайдера"""
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) or 0
+        prompt = usage.prompt_tokens or 0
+        self.requests += 1
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        PROMPT_TOKENS.inc(self.key, 'prompt', amount=prompt)
+        PROMPT_TOKENS.inc(self.key, 'cached', amount=cached)
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'cached_ratio': self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+        }
+
+
+class PromptRegistry:
+    def __init__(self) -> None:
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        if template.name in self._templates:
+            raise ValueError(f"Шаблон {template.name} вже зареєстровано")
+        self._templates[template.name] = template
+        return template
+
+    def __getitem__(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def get(self, name: str, default: str) -> PromptTemplate:
+        return self._templates.get(name) or self._templates[default]
+
+    def stats(self) -> Dict[str, dict]:
+        """Статистика кешованих токенів для кожного шаблону, що вже використовувався"""
+        return {t.key: t.stats() for t in self._templates.values() if t.requests}
+
+
+PROMPTS = PromptRegistry()
+
+GRAMMAR_MODES = ('mode_simple', 'mode_basic', 'mode_full')
+MINIGAME_LEVELS = ('easy', 'normal', 'hard')
+
+# Інструкції для перевірки граматики залежно від режиму
+GRAMMAR_INSTRUCTIONS = {
+    'mode_simple': "Перевір граматику тексту. Надай тільки виправлений варіант тексту без жодних пояснень та коментарів. Не додавай зайвих пояснень, тільки виправлений текст.",
+    'mode_basic': "Перевір граматику тексту. Надай виправлений варіант тексту та поясни тільки базові помилки (орфографічні помилки, помилки в пунктуації). Не пояснюй складні граматичні правила.",
+    'mode_full': "Перевір граматику тексту. Надай виправлений варіант тексту та детально поясни всі знайдені помилки - як базові (орфографічні, пунктуаційні), так і граматичні (синтаксис, морфологія). Надай повне пояснення кожної помилки."
+}
+
+GRAMMAR_BATCH_INSTRUCTION = (
+    "Перевір граматику кожного тексту зі списку. Для кожного надай тільки виправлений варіант "
+    "без жодних пояснень та коментарів. Відповідай ТІЛЬКИ JSON у форматі: "
+    '{"results": [{"id": номер тексту, "corrected": "виправлений текст"}]}'
+)
+
+# Кількість помилок залежно від рівня
+MINIGAME_ERROR_COUNTS = {
+    'easy': '1 або 2 помилки',
+    'normal': '4 або 5 помилок',
+    'hard': '7 або 8 помилок'
+}
+
+# Опис речення, яке треба згенерувати, залежно від рівня
+MINIGAME_DIFFICULTY_PROMPTS = {
+    'easy': 'Створи просте українське речення (5-8 слів). Речення має бути про щось звичайне (погода, їжа, навчання). Надай ТІЛЬКИ речення без помилок.',
+    'normal': 'Створи середнє українське речення (8-12 слів). Речення має бути про щось цікаве (подорож, хобі, робота). Надай ТІЛЬКИ речення без помилок.',
+    'hard': 'Створи складне українське речення (12-18 слів). Речення має бути про щось складне (наука, філософія, технології). Надай ТІЛЬКИ речення без помилок.'
+}
+
+
+def _escape(text: str) -> str:
+    """Екранує фігурні дужки статичного тексту перед вставкою в шаблон str.format"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+for _mode in GRAMMAR_MODES:
+    PROMPTS.register(PromptTemplate(f'grammar.{_mode}', 1, GRAMMAR_INSTRUCTIONS[_mode]))
+
+PROMPTS.register(PromptTemplate('grammar.batch', 1, GRAMMAR_BATCH_INSTRUCTION, '{items}'))
+
+for _level in MINIGAME_LEVELS:
+    _error_count = MINIGAME_ERROR_COUNTS[_level]
+    _prompt = _escape(MINIGAME_DIFFICULTY_PROMPTS[_level])
+    PROMPTS.register(PromptTemplate(
+        f'puzzle.correct.{_level}', 1,
+        "Ти створюєш правильні українські речення. Надай ТІЛЬКИ речення без помилок, без пояснень.",
+        _prompt,
+    ))
+    PROMPTS.register(PromptTemplate(
+        f'puzzle.errors.{_level}', 1,
+        "Ти додаєш граматичні помилки до правильного речення. Надай ТІЛЬКИ речення з помилками, без пояснень.",
+        f"Візьми це правильне речення і додай до нього рівно {_error_count} граматичних помилок "
+        f"(орфографічні помилки, помилки в пунктуації, граматичні помилки). "
+        f"Надай ТІЛЬКИ речення з помилками, без пояснень та без правильного варіанту."
+        "\n\nПравильне речення: {correct}",
+    ))
+    # Кількість завдань - єдина змінна частина, тому вона в самому кінці
+    PROMPTS.register(PromptTemplate(
+        f'puzzle.batch.{_level}', 1,
+        "Ти створюєш завдання для мінігри з української граматики. Відповідай тільки валідним JSON у форматі: "
+        '{"puzzles": [{"correct": "речення без помилок", "with_errors": "речення з помилками"}]}',
+        f"Для кожного завдання: {_prompt} "
+        f"Потім додай до цього речення рівно {_error_count} граматичних помилок "
+        f"(орфографічні помилки, помилки в пунктуації, граматичні помилки)."
+        "\n\nКількість різних завдань: {count}",
+    ))
+
+PROMPTS.register(PromptTemplate(
+    'minigame.judge', 1,
+    "Ти перевіряєш чи дві речення мають однаковий сенс та правильну граматику. Відповідай тільки 'ТАК' або 'НІ' без пояснень.",
+    "Чи правильна відповідь гравця?\n\nПравильна відповідь: {correct}\nВідповідь гравця: {answer}",
+))
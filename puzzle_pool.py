@@ -0,0 +1,99 @@
+"""
+Пул заздалегідь згенерованих завдань мінігри для кожного рівня складності
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Завдання - пара (правильне речення, речення з помилками)
+Puzzle = Tuple[str, str]
+BatchGenerator = Callable[[str, int], Awaitable[List[Puzzle]]]
+
+
+class PuzzlePool:
+    """Тримає для кожного рівня чергу готових завдань та поповнює її пакетами у фоні"""
+
+    def __init__(
+        self,
+        generate_batch: BatchGenerator,
+        levels: Tuple[str, ...] = ('easy', 'normal', 'hard'),
+        low_water: int = 3,
+        target: int = 8,
+        batch_size: int = 4,
+    ) -> None:
+        self.generate_batch = generate_batch
+        self.low_water = low_water
+        self.target = target
+        self.batch_size = batch_size
+        self._pools: Dict[str, deque] = {level: deque() for level in levels}
+        self._refilling: Dict[str, bool] = {level: False for level in levels}
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.last_refill_seconds: Dict[str, float] = {level: 0.0 for level in levels}
+
+    def pop(self, level: str) -> Optional[Puzzle]:
+        """Бере готове завдання з пулу; None, якщо пул порожній"""
+        pool = self._pools.get(level)
+        if not pool:
+            self.pool_misses += 1
+            return None
+        self.pool_hits += 1
+        return pool.popleft()
+
+    def needs_refill(self, level: str) -> bool:
+        return level in self._pools and len(self._pools[level]) < self.low_water
+
+    def depth(self, level: str) -> int:
+        return len(self._pools.get(level, ()))
+
+    async def refill(self, level: str) -> None:
+        """Поповнює пул рівня до цільової глибини; паралельні виклики для рівня ігноруються"""
+        if self._refilling.get(level, True):
+            return
+        self._refilling[level] = True
+        try:
+            started = time.monotonic()
+            pool = self._pools[level]
+            while len(pool) < self.target:
+                count = min(self.batch_size, self.target - len(pool))
+                puzzles = await self.generate_batch(level, count)
+                if not puzzles:
+                    break
+                pool.extend(puzzles)
+                self.refills += 1
+            self.last_refill_seconds[level] = time.monotonic() - started
+            logger.info(
+                f"Пул завдань поповнено (рівень: {level}, глибина: {len(pool)}, "
+                f"час: {self.last_refill_seconds[level]:.2f}с)"
+            )
+        except Exception as e:
+            self.refill_errors += 1
+            logger.error(f"Помилка при поповненні пулу завдань (рівень: {level}): {str(e)}", exc_info=True)
+        finally:
+            self._refilling[level] = False
+
+    async def refill_all(self) -> None:
+        """Поповнює всі рівні, глибина яких опустилася нижче порогу"""
+        await asyncio.gather(*(self.refill(level) for level in self._pools if self.needs_refill(level)))
+
+    async def refill_job(self, context) -> None:
+        """Callback для JobQueue"""
+        await self.refill_all()
+
+    def stats(self) -> dict:
+        """Глибина пулів, попадання/промахи та час останнього поповнення"""
+        return {
+            'depth': {level: len(pool) for level, pool in self._pools.items()},
+            'pool_hits': self.pool_hits,
+            'pool_misses': self.pool_misses,
+            'refills': self.refills,
+            'refill_errors': self.refill_errors,
+            'last_refill_seconds': dict(self.last_refill_seconds),
+        }
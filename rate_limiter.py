@@ -0,0 +1,124 @@
+"""
+Обмеження частоти запитів: token bucket на користувача та глобальний ліміт запитів до OpenAI
+"""
+import asyncio
+import time
+from typing import Dict
+
+
+class RateLimitExceeded(Exception):
+    """Запит не вдалося пропустити до OpenAI в межах допустимого очікування"""
+
+
+class TokenBucket:
+    """Компактний стан одного відра: кількість токенів та час останнього поповнення"""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class UserRateLimiter:
+    """Token bucket для кожного user_id; відхиляє запит одразу, без очікування"""
+
+    def __init__(self, rate_per_minute: float = 10, burst: int = 5, max_users: int = 100_000) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_users = max_users
+        self._buckets: Dict[int, TokenBucket] = {}
+        self.allowed = 0
+        self.rejected = 0
+
+    def try_acquire(self, user_id: int) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_users:
+                self._evict_idle(now)
+            bucket = self._buckets[user_id] = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens < 1:
+            self.rejected += 1
+            return False
+        bucket.tokens -= 1
+        self.allowed += 1
+        return True
+
+    def _evict_idle(self, now: float) -> None:
+        # Відро, яке вже встигло заповнитися, нічим не відрізняється від нового - його можна забути
+        full_after = self.burst / self.rate if self.rate > 0 else float('inf')
+        for user_id in [uid for uid, b in self._buckets.items() if now - b.updated >= full_after]:
+            del self._buckets[user_id]
+        # Якщо цього не вистачило, видаляємо 10% найстаріших відер, щоб не сортувати на кожному новому користувачі
+        overflow = len(self._buckets) - int(self.max_users * 0.9)
+        if overflow > 0:
+            for user_id in sorted(self._buckets, key=lambda uid: self._buckets[uid].updated)[:overflow]:
+                del self._buckets[user_id]
+
+    def stats(self) -> dict:
+        return {'allowed': self.allowed, 'rejected': self.rejected, 'tracked_users': len(self._buckets)}
+
+
+class GlobalRateLimiter:
+    """Глобальний ліміт запитів (RPM) та токенів (TPM) до OpenAI з обмеженим часом очікування в черзі"""
+
+    def __init__(self, rpm: float = 500, tpm: float = 200_000, max_wait: float = 5.0) -> None:
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.max_wait = max_wait
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def set_limits(self, rpm: float, tpm: float) -> None:
+        """Змінює ліміти (наприклад, частка воркера від спільних лімітів); запас не перевищує нових лімітів"""
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self._requests = min(self._requests, self.rpm)
+        self._tokens = min(self._tokens, self.tpm)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    async def acquire(self, tokens: int) -> None:
+        """Чекає своєї черги; кидає RateLimitExceeded, якщо чекати довелося б довше за max_wait"""
+        tokens = min(float(tokens), self.tpm)
+        deadline = time.monotonic() + self.max_wait
+        has_waited = False
+        # Lock робить чергу справедливою: запити пропускаються в порядку надходження
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    self.admitted += 1
+                    return
+
+                wait = max(
+                    (1 - self._requests) * 60.0 / self.rpm,
+                    (tokens - self._tokens) * 60.0 / self.tpm,
+                )
+                if now + wait > deadline:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"Глобальний ліміт OpenAI: треба чекати {wait:.1f}с")
+                if not has_waited:
+                    has_waited = True
+                    self.waited += 1
+                await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {'admitted': self.admitted, 'waited': self.waited, 'rejected': self.rejected}
@@ -0,0 +1,129 @@
+"""
+Стійкість запитів до OpenAI: повтори з експоненційною затримкою, circuit breaker та статистика затримок
+"""
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """OpenAI зараз вважається недоступним, запит відхилено без звернення до нього"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx, таймаути та помилки з'єднання варто повторити; решта 4xx - ні"""
+    # Тут openai вже імпортовано клієнтом; локальний імпорт не сповільнює старт бота
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Читає Retry-After (секунди або HTTP-дата) чи retry-after-ms з відповіді з помилкою"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Експоненційна затримка з повним jitter: випадкове значення від 0 до base * 2^attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Ковзне вікно останніх затримок для кожного ключа (маршрут, модель, розмір відповіді); дає перцентилі для hedged-запитів"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """None, поки зібрано менше min_samples вимірювань"""
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class CircuitBreaker:
+    """
+    Після failure_threshold невдач поспіль перестає пропускати запити на recovery_time секунд.
+
+    Потім пропускає пробні запити: перший успіх закриває ланцюг, невдача - знову відкриває.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Кидає CircuitOpenError, якщо ланцюг відкритий"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_time:
+                self.rejected += 1
+                raise CircuitOpenError(f"OpenAI недоступний, наступна спроба через {self.retry_in():.0f}с")
+            self.state = self.HALF_OPEN
+            logger.info("Circuit breaker: пробний запит до OpenAI")
+
+    def retry_in(self) -> float:
+        return max(0.0, self.recovery_time - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker: OpenAI знову доступний")
+        self.state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(f"Circuit breaker відкрито після {self._failures} невдалих запитів до OpenAI")
+
+    def stats(self) -> dict:
+        return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected}
@@ -0,0 +1,182 @@
+"""
+Кеш відповідей перевірки граматики: LRU в пам'яті з TTL та необов'язковим SQLite
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str, casefold: bool = True) -> str:
+    """Нормалізує текст для ключа кешу: Unicode NFC, пробіли та (якщо casefold) регістр"""
+    text = ' '.join(unicodedata.normalize('NFC', text).split())
+    return text.lower() if casefold else text
+
+
+class SQLiteCacheBackend:
+    """
+    Постійне сховище кешу, щоб попадання переживали перезапуск бота.
+
+    Кожні prune_every записів видаляються прострочені рядки та найстаріші понад max_entries,
+    тому файл не росте необмежено, навіть якщо записи ніколи не читаються повторно.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, prune_every: int = 1000) -> None:
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.pruned = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "tokens INTEGER NOT NULL, latency REAL NOT NULL)"
+        )
+        # TTL однаковий для всіх записів, тому порядок expires_at - це порядок запису
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_expires_at ON response_cache (expires_at)")
+        with self._lock:
+            # Прострочені записи з попередніх запусків більше не потрібні
+            self._prune()
+
+    def _prune(self) -> None:
+        """Видаляє прострочені записи та найстаріші понад max_entries; викликається під self._lock"""
+        deleted = self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        if self.max_entries > 0:
+            deleted += self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        self._conn.commit()
+        self.pruned += deleted
+        if deleted:
+            logger.info(f"З SQLite-кешу відповідей видалено {deleted} записів")
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, tokens, latency FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] <= time.time():
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row
+
+    def set(self, key: str, value: str, expires_at: float, tokens: int, latency: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, tokens, latency) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, expires_at, tokens, latency)
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+            else:
+                self._conn.commit()
+
+
+class ResponseCache:
+    """LRU-кеш з TTL та обмеженням за кількістю записів і розміром у байтах"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 5_000_000,
+        ttl: float = 86400.0,
+        db_path: Optional[str] = None,
+        db_max_entries: int = 100_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, expires_at, tokens, latency)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+        self._backend = SQLiteCacheBackend(db_path, max_entries=db_max_entries) if db_path else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_tokens = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(mode: str, instruction: str, model: str, text: str) -> str:
+        """
+        Ключ кешу - хеш режиму, системної інструкції, моделі та нормалізованого тексту.
+        Регістр ігнорується лише в mode_simple: у режимах з поясненнями помилки регістру
+        теж пояснюються, тому «київ» і «Київ» мають різні відповіді.
+        """
+        casefold = mode == 'mode_simple'
+        raw = '\x1f'.join((mode, instruction, model, normalize_text(text, casefold=casefold)))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Повертає збережену відповідь або None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.time():
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self._backend is not None:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._backend.get, key)
+            if entry is not None:
+                self._store(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.saved_tokens += entry[2]
+        self.saved_seconds += entry[3]
+        return entry[0]
+
+    async def set(self, key: str, value: str, tokens: int = 0, latency: float = 0.0) -> None:
+        """Зберігає відповідь; tokens та latency потрібні для підрахунку економії"""
+        entry = (value, time.time() + self.ttl, tokens, latency)
+        self._store(key, entry)
+        if self._backend is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._backend.set, key, *entry)
+
+    def stats(self) -> dict:
+        """Лічильники попадань/промахів та оцінка заощаджених токенів і часу"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'saved_tokens': self.saved_tokens,
+            'saved_seconds': self.saved_seconds,
+            'db_pruned': self._backend.pruned if self._backend is not None else 0,
+        }
+
+    def _store(self, key: str, entry: tuple) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._size += len(entry[0].encode('utf-8'))
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        value = self._entries.pop(key)[0]
+        self._size -= len(value.encode('utf-8'))
@@ -0,0 +1,183 @@
+"""
+Компактний стан користувача замість словника user_data та обмеження кількості сесій у пам'яті.
+
+Session зберігає режим перевірки (IntEnum замість рядка), поля мінігри та час останньої
+активності в __slots__. Сесії, неактивні довше за idle_ttl, і найстаріші сесії понад
+max_sessions видаляються з пам'яті та зі сховища стану.
+"""
+import logging
+import time
+from enum import IntEnum
+from typing import Dict, List, Mapping, Optional
+
+from telegram.ext import CallbackContext, ContextTypes, ExtBot
+
+
+logger = logging.getLogger(__name__)
+
+
+class GrammarMode(IntEnum):
+    SIMPLE = 0
+    BASIC = 1
+    FULL = 2
+
+    @property
+    def key(self) -> str:
+        """Назва режиму в callback_data, шаблонах промптів та метриках"""
+        return _MODE_KEYS[self]
+
+    @classmethod
+    def from_key(cls, key, default: Optional['GrammarMode'] = None) -> 'GrammarMode':
+        """Приймає 'mode_full' (формат кнопок і старих записів) або число; невідоме значення - default"""
+        if isinstance(key, int):
+            try:
+                return cls(key)
+            except ValueError:
+                return cls.SIMPLE if default is None else default
+        mode = _MODES_BY_KEY.get(key)
+        if mode is None:
+            return cls.SIMPLE if default is None else default
+        return mode
+
+
+_MODE_KEYS = {GrammarMode.SIMPLE: 'mode_simple', GrammarMode.BASIC: 'mode_basic', GrammarMode.FULL: 'mode_full'}
+_MODES_BY_KEY = {key: mode for mode, key in _MODE_KEYS.items()}
+
+
+class Session:
+    """Стан одного користувача; створюється PTB для кожного нового user_id через ContextTypes"""
+
+    __slots__ = (
+        'grammar_mode', 'in_minigame', 'minigame_level', 'minigame_correct_answer',
+        'minigame_original', 'minigame_started_at', 'last_seen',
+    )
+
+    def __init__(self) -> None:
+        self.grammar_mode = GrammarMode.SIMPLE
+        self.in_minigame = False
+        self.minigame_level: Optional[str] = None
+        self.minigame_correct_answer: Optional[str] = None
+        self.minigame_original: Optional[str] = None
+        self.minigame_started_at = 0.0
+        self.last_seen = time.time()
+
+    def touch(self, now: Optional[float] = None) -> None:
+        self.last_seen = time.time() if now is None else now
+
+    def start_minigame(self, level: str, now: Optional[float] = None) -> None:
+        self.in_minigame = True
+        self.minigame_level = level
+        self.minigame_started_at = time.time() if now is None else now
+
+    def end_minigame(self) -> None:
+        """Скидає мінігру та звільняє рядки завдання"""
+        self.in_minigame = False
+        self.minigame_level = None
+        self.minigame_correct_answer = None
+        self.minigame_original = None
+        self.minigame_started_at = 0.0
+
+    def expire_minigame(self, ttl: float, now: Optional[float] = None) -> bool:
+        """Завершує покинуту мінігру, старшу за ttl; повертає True, якщо щось змінилось"""
+        if ttl <= 0 or not self.in_minigame:
+            return False
+        now = time.time() if now is None else now
+        # Сесії без мітки часу (створені до появи TTL) теж вважаються покинутими
+        if now - self.minigame_started_at < ttl:
+            return False
+        self.end_minigame()
+        return True
+
+    def to_dict(self) -> dict:
+        """Формат сховища стану; сумісний зі словниками user_data попередніх версій"""
+        data = {'grammar_mode': self.grammar_mode.key, 'last_seen': self.last_seen}
+        if self.in_minigame:
+            data.update(
+                in_minigame=True,
+                minigame_level=self.minigame_level,
+                minigame_correct_answer=self.minigame_correct_answer,
+                minigame_original=self.minigame_original,
+                minigame_started_at=self.minigame_started_at,
+            )
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Session':
+        session = cls()
+        session.grammar_mode = GrammarMode.from_key(data.get('grammar_mode', GrammarMode.SIMPLE))
+        session.last_seen = float(data.get('last_seen') or session.last_seen)
+        if data.get('in_minigame'):
+            session.in_minigame = True
+            session.minigame_level = data.get('minigame_level')
+            session.minigame_correct_answer = data.get('minigame_correct_answer')
+            session.minigame_original = data.get('minigame_original')
+            session.minigame_started_at = float(data.get('minigame_started_at') or 0.0)
+        return session
+
+    def __deepcopy__(self, memo: dict) -> 'Session':
+        # PTB копіює user_data перед кожним записом у сховище; всі поля незмінні, тож достатньо
+        # поверхневої копії
+        copy = Session.__new__(Session)
+        for name in Session.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
+
+    def __repr__(self) -> str:
+        return f'Session(mode={self.grammar_mode.key}, in_minigame={self.in_minigame}, last_seen={self.last_seen:.0f})'
+
+
+class SessionContext(CallbackContext[ExtBot, Session, dict, dict]):
+    """CallbackContext, що оновлює час активності користувача при кожному зверненні до user_data"""
+
+    @property
+    def user_data(self) -> Optional[Session]:
+        session = super().user_data
+        if session is not None:
+            session.touch()
+        return session
+
+
+CONTEXT_TYPES = ContextTypes(context=SessionContext, user_data=Session)
+
+
+class SessionEvictor:
+    """Видаляє сесії, неактивні довше за idle_ttl, та найстаріші сесії понад max_sessions"""
+
+    def __init__(self, idle_ttl: float = 0, max_sessions: int = 0) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.evicted_idle = 0
+        self.evicted_overflow = 0
+        # Кількість сесій на момент останньої перевірки (для /metrics)
+        self.sessions = 0
+
+    def select(self, sessions: Mapping[int, Session], now: Optional[float] = None) -> List[int]:
+        """Повертає id користувачів, чиї сесії треба видалити"""
+        now = time.time() if now is None else now
+        evict: List[int] = []
+        if self.idle_ttl > 0:
+            deadline = now - self.idle_ttl
+            evict = [user_id for user_id, session in sessions.items() if session.last_seen < deadline]
+            self.evicted_idle += len(evict)
+        overflow = len(sessions) - len(evict) - self.max_sessions
+        if self.max_sessions > 0 and overflow > 0:
+            evicted = set(evict)
+            oldest = sorted(
+                (session.last_seen, user_id) for user_id, session in sessions.items() if user_id not in evicted
+            )
+            evict.extend(user_id for _, user_id in oldest[:overflow])
+            self.evicted_overflow += overflow
+        return evict
+
+    async def evict_job(self, context: SessionContext) -> None:
+        """Callback для JobQueue: видаляє сесії з пам'яті та (при наступному записі) зі сховища"""
+        application = context.application
+        evict = self.select(application.user_data)
+        for user_id in evict:
+            application.drop_user_data(user_id)
+        self.sessions = len(application.user_data)
+        if evict:
+            logger.info(f"Видалено {len(evict)} неактивних сесій (залишилось: {len(application.user_data)})")
+
+    def stats(self) -> Dict[str, int]:
+        return {'sessions': self.sessions, 'evicted_idle': self.evicted_idle, 'evicted_overflow': self.evicted_overflow}
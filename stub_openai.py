@@ -0,0 +1,218 @@
+"""
+Локальний OpenAI-сумісний stub-сервер для бенчмарків (chat.completions, зі стрімінгом)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class StubOpenAIServer:
+    """
+    Імітує /v1/chat/completions з налаштовуваною затримкою.
+
+    Затримка відповіді = latency + per_char_latency * довжина повідомлень.
+    Відповідь: для JSON-режиму - результати пакетної перевірки або пакет завдань мінігри,
+    для перевірки відповіді - 'ТАК', для решти - текст останнього повідомлення користувача.
+
+    Ін'єкція збоїв: частка error_rate запитів отримує 429 (з Retry-After) або 500,
+    а частка slow_rate відповідає із затримкою slow_latency (імітація хвоста затримок).
+    Для тестів fault_script задає поведінку перших запитів по черзі: '429', '500', 'slow'
+    або 'ok'; після нього діють випадкові частки.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        latency: float = 0.2,
+        per_char_latency: float = 0.0,
+        stream_chunks: int = 10,
+        error_rate: float = 0.0,
+        retry_after: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 2.0,
+        fault_script: Iterable[str] = (),
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.per_char_latency = per_char_latency
+        self.stream_chunks = stream_chunks
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.fault_script = deque(fault_script)
+        self.requests = 0
+        self.injected_errors = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}/v1'
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Stub OpenAI слухає {self.base_url}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Keep-alive: httpx використовує одне з'єднання для багатьох запитів
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                headers = {}
+                for line in head.decode('latin-1').split('\r\n')[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                await self._handle_request(json.loads(body or b'{}'), writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, payload: dict, writer: asyncio.StreamWriter) -> None:
+        self.requests += 1
+        fault = self.fault_script.popleft() if self.fault_script else None
+        if fault in ('429', '500'):
+            await self._write_error(writer, int(fault))
+            return
+        if fault is None and random.random() < self.error_rate:
+            await self._write_error(writer)
+            return
+        messages = payload.get('messages', [])
+        content = self._make_content(payload, messages)
+        prompt_chars = sum(len(m.get('content') or '') for m in messages)
+        usage = {
+            'prompt_tokens': prompt_chars // 2,
+            'completion_tokens': len(content) // 2,
+            'total_tokens': (prompt_chars + len(content)) // 2,
+            'prompt_tokens_details': {'cached_tokens': 0},
+        }
+        delay = self.latency + self.per_char_latency * prompt_chars
+        if fault == 'slow' or (fault is None and random.random() < self.slow_rate):
+            delay += self.slow_latency
+
+        if payload.get('stream'):
+            await self._write_stream(writer, payload, content, usage, delay)
+            return
+
+        await asyncio.sleep(delay)
+        self._write_json(writer, 200, {
+            'id': f'stub-{self.requests}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+            'usage': usage,
+        })
+        await writer.drain()
+
+    async def _write_error(self, writer: asyncio.StreamWriter, status: Optional[int] = None) -> None:
+        self.injected_errors += 1
+        await asyncio.sleep(self.latency / 4)
+        if status == 429 or (status is None and random.random() < 0.5):
+            status, headers = 429, f'Retry-After: {self.retry_after}\r\n' if self.retry_after else ''
+            error = {'message': 'Rate limit reached (stub)', 'type': 'requests', 'code': 'rate_limit_exceeded'}
+        else:
+            status, headers = 500, ''
+            error = {'message': 'Internal server error (stub)', 'type': 'server_error', 'code': None}
+        self._write_json(writer, status, {'error': error}, headers)
+        await writer.drain()
+
+    @staticmethod
+    def _make_content(payload: dict, messages: list) -> str:
+        if (payload.get('response_format') or {}).get('type') == 'json_object':
+            # Пакетна перевірка граматики: повертаємо тексти без змін з тими ж id
+            try:
+                items = json.loads(messages[-1].get('content', ''))['items']
+                return json.dumps({'results': [{'id': item['id'], 'corrected': item['text']} for item in items]}, ensure_ascii=False)
+            except (ValueError, KeyError, TypeError):
+                pass
+            puzzles = [{'correct': f'Це правильне речення номер {i}.', 'with_errors': f'Це правильне речення намер {i}'} for i in range(8)]
+            return json.dumps({'puzzles': puzzles}, ensure_ascii=False)
+        system = messages[0].get('content', '') if messages else ''
+        if "'ТАК' або 'НІ'" in system:
+            return 'ТАК'
+        return messages[-1].get('content', '') if messages else ''
+
+    @staticmethod
+    def _write_json(writer: asyncio.StreamWriter, status: int, payload: dict, extra_headers: str = '') -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n{extra_headers}\r\n'.encode('latin-1') + body
+        )
+
+    async def _write_stream(self, writer, payload: dict, content: str, usage: dict, delay: float) -> None:
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n')
+        step = max(1, len(content) // self.stream_chunks + 1)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)] or ['']
+        for piece in pieces:
+            await asyncio.sleep(delay / len(pieces))
+            self._write_event(writer, {
+                'id': f'stub-{self.requests}', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': payload.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}],
+            })
+            await writer.drain()
+        self._write_event(writer, {
+            'id': f'stub-{self.requests}', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': payload.get('model', 'stub'), 'choices': [], 'usage': usage,
+        })
+        self._write_chunk(writer, b'data: [DONE]\n\n')
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    def _write_event(self, writer, payload: dict) -> None:
+        self._write_chunk(writer, b'data: ' + json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n\n')
+
+    @staticmethod
+    def _write_chunk(writer, data: bytes) -> None:
+        writer.write(f'{len(data):x}\r\n'.encode('latin-1') + data + b'\r\n')
+
+
+async def _serve(args) -> None:
+    server = StubOpenAIServer(
+        args.host, args.port, args.latency, args.per_char_latency, args.stream_chunks,
+        args.error_rate, args.retry_after, args.slow_rate, args.slow_latency,
+    )
+    await server.start()
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='базова затримка відповіді в секундах')
+    parser.add_argument('--per-char-latency', type=float, default=0.0, help='додаткова затримка на символ запиту')
+    parser.add_argument('--stream-chunks', type=int, default=10, help='на скільки чанків ділити відповідь при стрімінгу')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='частка запитів, що отримують 429 або 500')
+    parser.add_argument('--retry-after', type=float, default=0.0, help='значення Retry-After для 429 (0 - без заголовка)')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='частка запитів з додатковою затримкою')
+    parser.add_argument('--slow-latency', type=float, default=2.0, help='додаткова затримка повільних запитів')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    asyncio.run(_serve(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Багатопроцесний режим: супервізор приймає оновлення (polling або webhook) і розподіляє їх
+між воркерами за id користувача.
+
+Всі оновлення одного користувача потрапляють до одного воркера, якому належить його стан,
+а воркер обробляє оновлення одного чату по черзі, тому в приватному чаті порядок зберігається.
+Стан користувачів воркери зберігають у спільному сховищі (SQLite у режимі WAL або Redis).
+
+Запуск:
+    python supervisor.py --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from config import ConfigError
+from metrics import REGISTRY
+from update_processor import shard_key
+from webhook_server import run_webhook, start_metrics_server
+
+
+logger = logging.getLogger(__name__)
+
+
+def worker_main(index: int, workers: int, queue) -> None:
+    """Точка входу процесу-воркера: звичайний Application без Updater, що читає оновлення з черги"""
+    # Зупинкою воркерів керує супервізор, щоб вони встигли обробити чергу та зберегти стан
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    import bot
+
+    application = bot.build_application(updater=False, worker=index, workers=workers)
+    asyncio.run(_run_worker(index, application, queue, bot.config.metrics_port, bot.config.metrics_listen))
+
+
+async def _run_worker(index: int, application: Application, queue, metrics_port: int, metrics_listen: str) -> None:
+    loop = asyncio.get_running_loop()
+    if metrics_port:
+        # Порт супервізора - METRICS_PORT, воркери займають наступні
+        start_metrics_server(metrics_port + 1 + index, metrics_listen)
+
+    async with application:
+        await application.start()
+        logger.info(f"Воркер {index} запущено")
+        try:
+            while True:
+                data = await loop.run_in_executor(None, queue.get)
+                if data is None:
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            await application.stop()
+    logger.info(f"Воркер {index} зупинено")
+
+
+class Supervisor:
+    """Запускає воркери, розподіляє оновлення за id користувача та перезапускає воркери, що впали"""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        # spawn: воркери не успадковують з'єднання та клієнти батьківського процесу
+        self._context = multiprocessing.get_context('spawn')
+        self._queues = [self._context.Queue() for _ in range(workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.dispatched = [0] * workers
+        self.restarts = 0
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._start_worker(index)
+
+    def _start_worker(self, index: int) -> None:
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.workers, self._queues[index]),
+            name=f'grammar-bot-worker-{index}',
+        )
+        process.start()
+        self._processes[index] = process
+
+    def dispatch(self, update: Update) -> int:
+        """Кладе оновлення в чергу воркера, якому належить стан користувача; повертає номер воркера"""
+        index = shard_key(update) % self.workers
+        self._queues[index].put(update.to_dict())
+        self.dispatched[index] += 1
+        return index
+
+    async def dispatch_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        self.dispatch(update)
+
+    def check_workers(self) -> None:
+        """Перезапускає воркери, що завершилися; оновлення в їхніх чергах не губляться"""
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                logger.error(f"Воркер {index} завершився з кодом {process.exitcode}, перезапускаємо")
+                self.restarts += 1
+                self._start_worker(index)
+
+    async def check_workers_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Callback для JobQueue"""
+        self.check_workers()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Просить воркери дообробити чергу та завершитися; тих, хто не встиг, зупиняє примусово"""
+        for queue in self._queues:
+            queue.put(None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Воркер {index} не завершився за {timeout:.0f}с, зупиняємо примусово")
+                process.terminate()
+                process.join()
+
+    def collect_stats(self):
+        """Колектор для /metrics супервізора"""
+        for index, count in enumerate(self.dispatched):
+            yield 'grammar_bot_supervisor_dispatched_total', 'counter', 'Оновлення, передані воркеру', {'worker': str(index)}, count
+        for index, process in enumerate(self._processes):
+            alive = int(process is not None and process.is_alive())
+            yield 'grammar_bot_supervisor_worker_up', 'gauge', 'Чи працює воркер', {'worker': str(index)}, alive
+        yield 'grammar_bot_supervisor_restarts_total', 'counter', 'Перезапуски воркерів', {}, self.restarts
+
+
+def run_supervisor(workers: int) -> None:
+    """Запускає супервізор з workers процесами-воркерами до отримання SIGINT/SIGTERM"""
+    import bot
+
+    bot.config.validate()
+    supervisor = Supervisor(workers)
+    REGISTRY.register_collector(supervisor.collect_stats)
+
+    # Супервізор тільки розподіляє оновлення, тому обробляє їх послідовно і без сховища стану
+    builder = Application.builder().token(bot.config.telegram_bot_token)
+    if bot.config.telegram_api_base_url:
+        builder = builder.base_url(bot.config.telegram_api_base_url)
+    if bot.config.webhook_url:
+        builder = builder.updater(None)
+    if bot.config.metrics_port:
+        builder = builder.post_init(bot.start_metrics)
+    application = builder.build()
+    application.add_handler(TypeHandler(Update, supervisor.dispatch_handler))
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(supervisor.check_workers_job, interval=5, first=5)
+
+    supervisor.start()
+    logger.info(f"Супервізор запущено (воркерів: {workers})")
+    try:
+        if bot.config.webhook_url:
+            asyncio.run(run_webhook(
+                application,
+                url=bot.config.webhook_url,
+                listen=bot.config.webhook_listen,
+                port=bot.config.webhook_port,
+                path=bot.config.webhook_path,
+                secret_token=bot.config.webhook_secret_token,
+                allowed_updates=bot.ALLOWED_UPDATES,
+            ))
+        else:
+            application.run_polling(allowed_updates=bot.ALLOWED_UPDATES)
+    finally:
+        supervisor.stop()
+        logger.info("Супервізор зупинено")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='кількість процесів-воркерів')
+    args = parser.parse_args()
+    try:
+        run_supervisor(args.workers)
+    except ConfigError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
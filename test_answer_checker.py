@@ -0,0 +1,72 @@
+"""
+Тести локальної перевірки відповідей мінігри на корпусі прикладів.
+
+pytest test_answer_checker.py     - очікувані рішення та частка уникнутих викликів LLM
+python test_answer_checker.py     - звіт по корпусу
+"""
+import pytest
+
+from answer_checker import AnswerChecker, normalize_answer
+
+
+# (правильне речення, речення з помилками, відповідь гравця, очікуване рішення: True/False - локально, None - LLM)
+SAMPLE_CORPUS = [
+    ("Сьогодні дуже гарна погода.", "Сьогодні дуже гарна пагода", "Сьогодні дуже гарна погода.", True),
+    ("Сьогодні дуже гарна погода.", "Сьогодні дуже гарна пагода", "сьогодні  дуже гарна погода", True),
+    ("Сьогодні дуже гарна погода.", "Сьогодні дуже гарна пагода", "Сьогодні дуже гарна пагода", False),
+    ("Я п'ю каву з молоком.", "Я пю каву смолоком.", "Я п’ю каву з молоком.", True),
+    ("Я п'ю каву з молоком.", "Я пю каву смолоком.", "Я пʼю каву з молоком", True),
+    ("Я п'ю каву з молоком.", "Я пю каву смолоком.", "Я п'ю каву з молоком!", True),
+    ("Я п'ю каву з молоком.", "Я пю каву смолоком.", "Я пю каву з молоком.", None),
+    ("Я п'ю каву з молоком.", "Я пю каву смолоком.", "Не знаю", False),
+    ("Мій брат любить читати книжки про космос.", "Мій брад любить четати книшки про космос", "Мій брат любить читати книжки про космос.", True),
+    ("Мій брат любить читати книжки про космос.", "Мій брад любить четати книшки про космос", "Мій брат любить читати книги про космос.", None),
+    ("Мій брат любить читати книжки про космос.", "Мій брад любить четати книшки про космос", "Моя сестра грає у футбол", False),
+    ("Мій брат любить читати книжки про космос.", "Мій брад любить четати книшки про космос", "?", False),
+    ("Влітку ми поїхали до Львова, де гуляли старим містом.", "Влітку ми поїхали до львова де гулялі старим містом", "Влітку ми поїхали до Львова, де гуляли старим містом.", True),
+    ("Влітку ми поїхали до Львова, де гуляли старим містом.", "Влітку ми поїхали до львова де гулялі старим містом", "Влітку ми поїхали до Львова де гуляли старим містом.", None),
+    ("Влітку ми поїхали до Львова, де гуляли старим містом.", "Влітку ми поїхали до львова де гулялі старим містом", "Влітку ми поїхали до Львова, де гуляли по старому місту.", None),
+    ("Влітку ми поїхали до Львова, де гуляли старим містом.", "Влітку ми поїхали до львова де гулялі старим містом", "Взимку я сидів удома.", False),
+    ("Наука допомагає людям зрозуміти світ — від атомів до галактик.", "Наука допомагае людям зрозуміти світ від атомів до галактик", "Наука допомагає людям зрозуміти світ - від атомів до галактик", True),
+    ("Наука допомагає людям зрозуміти світ — від атомів до галактик.", "Наука допомагае людям зрозуміти світ від атомів до галактик", "наука допомагає людям зрозуміти світ від атомів до галактик", None),
+    ("Наука допомагає людям зрозуміти світ — від атомів до галактик.", "Наука допомагае людям зрозуміти світ від атомів до галактик", "Наука допомагае людям зрозуміти світ від атомів до галактик", False),
+    ("Наука допомагає людям зрозуміти світ — від атомів до галактик.", "Наука допомагае людям зрозуміти світ від атомів до галактик", "Привіт", False),
+]
+
+
+@pytest.mark.parametrize('correct, original, answer, expected', SAMPLE_CORPUS)
+def test_corpus_verdicts(correct, original, answer, expected):
+    assert AnswerChecker().check(answer, correct.lower(), original) is expected
+
+
+def test_most_answers_are_decided_without_llm():
+    checker = AnswerChecker()
+    for correct, original, answer, _ in SAMPLE_CORPUS:
+        checker.check(answer, correct.lower(), original)
+    stats = checker.stats()
+    assert stats['llm_checks'] == sum(1 for *_, expected in SAMPLE_CORPUS if expected is None)
+    assert stats['llm_avoided_ratio'] >= 0.75
+
+
+def test_normalize_answer_unifies_apostrophes_dashes_and_case():
+    assert normalize_answer("Я п’ю каву — з молоком.") == normalize_answer("я пʼю каву - з молоком")
+
+
+def print_report() -> None:
+    """Рішення для кожної відповіді корпусу та скільки викликів LLM вдалося уникнути"""
+    checker = AnswerChecker()
+    for correct, original, answer, _ in SAMPLE_CORPUS:
+        verdict = checker.check(answer, correct.lower(), original)
+        label = {True: 'ТАК (локально)', False: 'НІ (локально)', None: 'LLM'}[verdict]
+        print(f"{label:16} | {answer}")
+    stats = checker.stats()
+    print()
+    print(f"Відповідей у корпусі: {len(SAMPLE_CORPUS)}")
+    print(f"Вирішено локально: {stats['local_accepts'] + stats['local_rejects']} "
+          f"(прийнято: {stats['local_accepts']}, відхилено: {stats['local_rejects']})")
+    print(f"Перевірок через LLM: {stats['llm_checks']} "
+          f"(уникнуто {stats['llm_avoided_ratio']:.0%} викликів)")
+
+
+if __name__ == '__main__':
+    print_report()
@@ -1,48 +1,185 @@
 """
-Тестовий скрипт для перевірки налаштування авторизації
+Тести та бенчмарк перевірки авторизації.
+
+pytest test_auth.py     - тести списку дозволених користувачів
+python test_auth.py     - перевірка налаштування .env та бенчмарк пошуку
 """
+import logging
 import os
-from dotenv import load_dotenv
+import random
+import time
+
+import pytest
+
+from auth import Allowlist, parse_user_ids
+
+
+def test_parse_user_ids_accepts_commas_spaces_and_comments():
+    raw = "123456789, 987654321\n555 # адміністратор\n\n# коментар\n42;43"
+    assert parse_user_ids(raw) == {123456789, 987654321, 555, 42, 43}
+
+
+def test_parse_user_ids_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_user_ids("123, abc")
+
+
+def test_empty_allowlist_allows_everyone():
+    allowlist = Allowlist('')
+    assert not allowlist.enabled
+    assert allowlist.is_allowed(1)
+    assert allowlist.stats()['denied'] == 0
+
+
+def test_allowlist_membership():
+    allowlist = Allowlist('1,2,3')
+    assert allowlist.is_allowed(2)
+    assert not allowlist.is_allowed(4)
+    assert allowlist.stats()['allowed'] == 1
+    assert allowlist.stats()['denied'] == 1
+
+
+def test_file_is_merged_with_env_and_hot_reloaded(tmp_path):
+    path = tmp_path / 'allowed.txt'
+    path.write_text('10\n11\n', encoding='utf-8')
+    allowlist = Allowlist('1', str(path))
+    assert allowlist.is_allowed(1) and allowlist.is_allowed(10)
+    assert not allowlist.reload_if_changed()
+
+    path.write_text('12\n', encoding='utf-8')
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert allowlist.reload_if_changed()
+    assert allowlist.is_allowed(12) and allowlist.is_allowed(1)
+    assert not allowlist.is_allowed(10)
+
+
+def test_broken_file_keeps_previous_list(tmp_path):
+    path = tmp_path / 'allowed.txt'
+    path.write_text('10\n', encoding='utf-8')
+    allowlist = Allowlist('', str(path))
+
+    path.write_text('10, oops\n', encoding='utf-8')
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert not allowlist.reload_if_changed()
+    assert allowlist.is_allowed(10)
+    assert allowlist.stats()['reload_errors'] == 1
+
 
-load_dotenv()
+def test_empty_file_keeps_previous_list(tmp_path):
+    path = tmp_path / 'allowed.txt'
+    path.write_text('10\n', encoding='utf-8')
+    allowlist = Allowlist('', str(path))
 
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-ALLOWED_USER_IDS = os.getenv('ALLOWED_USER_IDS', '')
+    path.write_text('# тільки коментар\n', encoding='utf-8')
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert not allowlist.reload_if_changed()
+    assert allowlist.is_allowed(10)
+    assert not allowlist.is_allowed(11)
+    assert allowlist.stats()['reload_errors'] == 1
 
-print("=" * 60)
-print("Перевірка налаштування авторизації")
-print("=" * 60)
-print()
 
-print(f"TELEGRAM_BOT_TOKEN: {'✅ Встановлено' if TELEGRAM_BOT_TOKEN else '❌ Не встановлено'}")
-print(f"OPENAI_API_KEY: {'✅ Встановлено' if OPENAI_API_KEY else '❌ Не встановлено'}")
-print()
+def test_missing_or_empty_file_denies_everyone_but_env_ids(tmp_path):
+    allowlist = Allowlist('1', str(tmp_path / 'missing.txt'))
+    assert allowlist.enabled
+    assert allowlist.is_allowed(1)
+    assert not allowlist.is_allowed(2)
+    assert allowlist.stats()['reload_errors'] == 1
 
-print(f"ALLOWED_USER_IDS (сирий рядок): '{ALLOWED_USER_IDS}'")
-print(f"ALLOWED_USER_IDS (довжина): {len(ALLOWED_USER_IDS)}")
-print()
+    path = tmp_path / 'empty.txt'
+    path.write_text('', encoding='utf-8')
+    allowlist = Allowlist('', str(path))
+    assert allowlist.enabled and len(allowlist) == 0
+    assert not allowlist.is_allowed(1)
+
+
+def test_denial_logging_is_rate_limited(caplog):
+    allowlist = Allowlist('1', denial_log_interval=60)
+    with caplog.at_level(logging.WARNING, logger='auth'):
+        for _ in range(100):
+            allowlist.is_allowed(7)
+        allowlist.is_allowed(8)
+    assert len(caplog.records) == 2
+    assert allowlist.stats()['suppressed_logs'] == 99
+
+
+def test_benchmark_runs():
+    results = benchmark_lookup(size=1000, lookups=1000)
+    assert set(results) == {'list', 'allowlist'}
+
+
+def benchmark_lookup(size: int = 100_000, lookups: int = 100_000) -> dict:
+    """Порівнює пошук у списку (стара реалізація) з Allowlist; повертає мкс на перевірку"""
+    ids = random.sample(range(10**9), size)
+    probes = [random.choice(ids) if i % 2 else random.randrange(10**9) for i in range(lookups)]
+    id_list = list(ids)
+    allowlist = Allowlist(','.join(map(str, ids)), denial_log_interval=float('inf'))
+    auth_logger = logging.getLogger('auth')
+    previous_level = auth_logger.level
+    auth_logger.setLevel(logging.ERROR)
+
+    started = time.perf_counter()
+    for user_id in probes:
+        user_id in id_list
+    list_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for user_id in probes:
+        allowlist.is_allowed(user_id)
+    allowlist_seconds = time.perf_counter() - started
+    auth_logger.setLevel(previous_level)
+
+    return {
+        'list': list_seconds / lookups * 1e6,
+        'allowlist': allowlist_seconds / lookups * 1e6,
+    }
+
+
+def print_env_report() -> None:
+    """Перевірка налаштування авторизації в .env"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    allowed_user_ids = os.getenv('ALLOWED_USER_IDS', '')
+    allowed_user_ids_file = os.getenv('ALLOWED_USER_IDS_FILE') or None
+
+    print("=" * 60)
+    print("Перевірка налаштування авторизації")
+    print("=" * 60)
+    print()
+
+    print(f"TELEGRAM_BOT_TOKEN: {'✅ Встановлено' if telegram_bot_token else '❌ Не встановлено'}")
+    print(f"OPENAI_API_KEY: {'✅ Встановлено' if openai_api_key else '❌ Не встановлено'}")
+    print()
+
+    print(f"ALLOWED_USER_IDS (сирий рядок): '{allowed_user_ids}'")
+    print(f"ALLOWED_USER_IDS_FILE: {allowed_user_ids_file or 'не встановлено'}")
+    print()
 
-# Парсинг списку
-ALLOWED_USER_IDS_LIST = []
-if ALLOWED_USER_IDS:
     try:
-        ALLOWED_USER_IDS_LIST = [int(uid.strip()) for uid in ALLOWED_USER_IDS.split(',') if uid.strip()]
-        print(f"✅ Успішно розпарсено {len(ALLOWED_USER_IDS_LIST)} ID:")
-        for uid in ALLOWED_USER_IDS_LIST:
-            print(f"   - {uid}")
+        allowlist = Allowlist(allowed_user_ids, allowed_user_ids_file)
     except ValueError as e:
         print(f"❌ Помилка при парсингу: {e}")
         print(f"   Перевірте формат у .env файлі. Має бути: ALLOWED_USER_IDS=123456789,987654321")
-else:
-    print("⚠️  ALLOWED_USER_IDS не встановлено або порожній")
-    print("   Бот буде доступний ВСІМ користувачам!")
-
-print()
-print("=" * 60)
-if ALLOWED_USER_IDS_LIST:
-    print(f"✅ Авторизація активна: доступ мають {len(ALLOWED_USER_IDS_LIST)} користувачів")
-else:
-    print("⚠️  Авторизація НЕ активна: доступ мають ВСІ користувачі")
-print("=" * 60)
+        return
+
+    print()
+    print("=" * 60)
+    if allowlist.enabled:
+        print(f"✅ Авторизація активна: доступ мають {len(allowlist)} користувачів")
+    else:
+        print("⚠️  Авторизація НЕ активна: доступ мають ВСІ користувачі")
+    print("=" * 60)
+
 
+if __name__ == '__main__':
+    print_env_report()
+    print()
+    for size in (10, 1_000, 100_000):
+        results = benchmark_lookup(size=size, lookups=2_000)
+        print(
+            f"Список з {size} ID: list {results['list']:.3f} мкс/перевірка, "
+            f"Allowlist {results['allowlist']:.3f} мкс/перевірка"
+        )
@@ -0,0 +1,86 @@
+"""
+Тести пакетування перевірок: розбір відповіді на пакет та відкат до поодиноких запитів.
+
+pytest test_grammar_batcher.py
+"""
+import asyncio
+import json
+
+import pytest
+
+from grammar_batcher import GrammarBatcher, MalformedBatchError, parse_batch_results
+
+
+def batch_response(ids, texts) -> str:
+    return json.dumps({'results': [{'id': i, 'corrected': text} for i, text in zip(ids, texts)]}, ensure_ascii=False)
+
+
+def test_parse_batch_results_orders_by_id():
+    content = batch_response([1, 0], ['друге', 'перше'])
+    assert parse_batch_results(content, 2) == ['перше', 'друге']
+
+
+@pytest.mark.parametrize('content', [
+    batch_response([0, 2], ['a', 'b']),       # чужий id
+    batch_response([0], ['a']),               # не вистачає результату
+    batch_response([0, 1, 2], ['a', 'b', 'c']),
+    '{"results": [{"id": "x", "corrected": "a"}]}',
+    '{"items": []}',
+    'не JSON',
+])
+def test_parse_batch_results_rejects_mismatched_responses(content):
+    with pytest.raises(MalformedBatchError):
+        parse_batch_results(content, 2)
+
+
+def run_batch(check_batch, texts):
+    """Надсилає тексти одночасно (одним пакетом) і повертає (результати, батчер, перевірені поодинці тексти)"""
+    singles = []
+
+    async def check_single(text):
+        singles.append(text)
+        return text.upper(), 1
+
+    async def scenario():
+        batcher = GrammarBatcher(check_batch, check_single, max_batch_size=len(texts), max_wait=1.0)
+        results = await asyncio.gather(*(batcher.submit(text) for text in texts))
+        return results, batcher
+
+    results, batcher = asyncio.run(scenario())
+    return results, batcher, singles
+
+
+@pytest.mark.parametrize('content', [
+    batch_response([0, 1, 5], ['a', 'b', 'c']),
+    batch_response([0, 1], ['a', 'b']),
+])
+def test_malformed_batch_falls_back_to_single_checks(content):
+    async def check_batch(texts):
+        return [(text, 1) for text in parse_batch_results(content, len(texts))]
+
+    texts = ['один', 'два', 'три']
+    results, batcher, singles = run_batch(check_batch, texts)
+    assert results == [('ОДИН', 1), ('ДВА', 1), ('ТРИ', 1)]
+    assert sorted(singles) == sorted(texts)
+    assert batcher.stats()['fallbacks'] == 1
+    assert batcher.stats()['batches'] == 0
+
+
+def test_wrong_result_count_falls_back_to_single_checks():
+    async def check_batch(texts):
+        return [('зайвий', 1)]
+
+    results, batcher, singles = run_batch(check_batch, ['один', 'два'])
+    assert results == [('ОДИН', 1), ('ДВА', 1)]
+    assert batcher.stats()['fallbacks'] == 1
+
+
+def test_valid_batch_resolves_in_one_request():
+    async def check_batch(texts):
+        content = batch_response(reversed(range(len(texts))), [text + '!' for text in reversed(texts)])
+        return [(text, 1) for text in parse_batch_results(content, len(texts))]
+
+    results, batcher, singles = run_batch(check_batch, ['один', 'два'])
+    assert results == [('один!', 1), ('два!', 1)]
+    assert singles == []
+    assert batcher.stats()['batches'] == 1 and batcher.stats()['fallbacks'] == 0
@@ -0,0 +1,26 @@
+"""
+Тести маршрутизації моделей: бюджети токенів та облік обрізаних відповідей.
+
+pytest test_model_router.py
+"""
+from model_router import ModelRouter, default_routes
+
+
+def test_explanation_modes_keep_a_floor_near_the_old_budget():
+    router = ModelRouter(default_routes())
+    assert router.route('mode_simple', chars=20).max_tokens < 100
+    assert router.route('mode_basic', chars=20).max_tokens >= 1024
+    assert router.route('mode_full', chars=20).max_tokens >= 1500
+    assert router.route('mode_full', chars=1000).max_tokens > router.route('mode_full', chars=20).max_tokens
+
+
+def test_truncated_responses_are_counted_per_route(caplog):
+    router = ModelRouter(default_routes())
+    choice = router.route('mode_full', chars=100)
+    router.record(choice, 1.0, tokens=10)
+    router.record(choice, 1.0, tokens=10, truncated=True)
+    stats = router.stats()
+    assert stats['mode_full']['truncated'] == 1
+    assert stats['mode_full']['requests'] == 2
+    assert stats['mode_basic']['truncated'] == 0
+    assert 'обрізана' in caplog.text
@@ -0,0 +1,91 @@
+"""
+Тести повторів, Retry-After, circuit breaker та hedged-запитів OpenAIPool на stub-сервері з ін'єкцією збоїв.
+
+pytest test_openai_pool.py
+"""
+import asyncio
+import socket
+import time
+
+import pytest
+
+from openai_pool import OpenAIPool, latency_key
+from resilience import CircuitBreaker, CircuitOpenError
+from stub_openai import StubOpenAIServer
+
+
+MODEL = 'gpt-4.1-nano'
+MESSAGES = [{'role': 'user', 'content': 'привіт'}]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_with_stub(scenario, hedging: bool = False, **stub_options):
+    """Запускає stub OpenAI і передає сценарію (server, pool)"""
+
+    async def main():
+        server = StubOpenAIServer(port=free_port(), latency=0.02, **stub_options)
+        await server.start()
+        pool = OpenAIPool(
+            api_key='test', base_url=server.base_url, timeout=5.0,
+            max_retries=2, retry_base_delay=0.01, retry_max_delay=1.0,
+            breaker=CircuitBreaker(failure_threshold=3, recovery_time=60),
+            hedging=hedging,
+        )
+        try:
+            return await scenario(server, pool)
+        finally:
+            await pool.client.close()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_429_with_retry_after_is_retried():
+    async def scenario(server, pool):
+        started = time.monotonic()
+        response = await pool.create(route='mode_simple', model=MODEL, max_tokens=64, messages=MESSAGES)
+        return response, time.monotonic() - started, server
+
+    response, elapsed, server = run_with_stub(scenario, fault_script=['429'], retry_after=0.3)
+    assert response.choices[0].message.content == 'привіт'
+    assert server.requests == 2 and server.injected_errors == 1
+    # Повтор чекав Retry-After, а не коротку експоненційну затримку
+    assert elapsed >= 0.3
+
+
+def test_repeated_5xx_opens_circuit_breaker():
+    async def scenario(server, pool):
+        import openai
+
+        with pytest.raises(openai.InternalServerError):
+            await pool.create(model=MODEL, max_tokens=64, messages=MESSAGES)
+        requests = server.requests
+        with pytest.raises(CircuitOpenError):
+            await pool.create(model=MODEL, max_tokens=64, messages=MESSAGES)
+        return requests, server.requests, pool.breaker.state
+
+    before, after, state = run_with_stub(scenario, fault_script=['500'] * 3)
+    # Перша спроба та 2 повтори; після відкриття ланцюга запит до OpenAI не надсилається
+    assert before == after == 3
+    assert state == CircuitBreaker.OPEN
+
+
+def test_slow_primary_is_beaten_by_hedge():
+    async def scenario(server, pool):
+        # Історія швидких відповідей для цього маршруту: p95 близько 20 мс
+        key = latency_key(MODEL, 'judge', 10)
+        for _ in range(pool.latency.min_samples):
+            pool.latency.record(key, 0.02)
+        started = time.monotonic()
+        response = await pool.create(route='judge', model=MODEL, max_tokens=10, messages=MESSAGES)
+        return response, time.monotonic() - started, server.requests
+
+    response, elapsed, requests = run_with_stub(scenario, hedging=True, fault_script=['slow'], slow_latency=3.0)
+    assert response.choices[0].message.content == 'привіт'
+    assert requests == 2
+    assert elapsed < 1.0
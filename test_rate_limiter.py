@@ -0,0 +1,65 @@
+"""
+Тести ліміту запитів користувача: поповнення відра та витіснення неактивних користувачів.
+
+pytest test_rate_limiter.py
+"""
+import rate_limiter
+from rate_limiter import UserRateLimiter
+
+
+def fake_clock(monkeypatch) -> list:
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_bucket_allows_burst_then_refills(monkeypatch):
+    now = fake_clock(monkeypatch)
+    limiter = UserRateLimiter(rate_per_minute=60, burst=3)
+    assert [limiter.try_acquire(1) for _ in range(4)] == [True, True, True, False]
+
+    now[0] += 1
+    assert limiter.try_acquire(1)
+    assert not limiter.try_acquire(1)
+
+    # Поповнення не перевищує burst
+    now[0] += 600
+    assert [limiter.try_acquire(1) for _ in range(4)] == [True, True, True, False]
+    assert limiter.stats()['allowed'] == 7 and limiter.stats()['rejected'] == 3
+
+
+def test_users_have_separate_buckets(monkeypatch):
+    fake_clock(monkeypatch)
+    limiter = UserRateLimiter(rate_per_minute=60, burst=1)
+    assert limiter.try_acquire(1)
+    assert not limiter.try_acquire(1)
+    assert limiter.try_acquire(2)
+
+
+def test_idle_buckets_are_evicted_first(monkeypatch):
+    now = fake_clock(monkeypatch)
+    limiter = UserRateLimiter(rate_per_minute=60, burst=2, max_users=10)
+    for user_id in range(5):
+        limiter.try_acquire(user_id)
+    # Відра 0-4 встигли заповнитися, 5-9 - ще ні
+    now[0] += 10
+    for user_id in range(5, 10):
+        limiter.try_acquire(user_id)
+
+    limiter.try_acquire(10)
+    assert limiter.stats()['tracked_users'] == 6
+    assert set(limiter._buckets) == {5, 6, 7, 8, 9, 10}
+
+
+def test_overflow_evicts_oldest_buckets(monkeypatch):
+    now = fake_clock(monkeypatch)
+    limiter = UserRateLimiter(rate_per_minute=1, burst=5, max_users=10)
+    for user_id in range(10):
+        now[0] += 1
+        limiter.try_acquire(user_id)
+
+    limiter.try_acquire(10)
+    # Жодне відро не заповнилося, тому видаляються 10% найстаріших
+    assert 0 not in limiter._buckets
+    assert 10 in limiter._buckets and 9 in limiter._buckets
+    assert limiter.stats()['tracked_users'] == 10
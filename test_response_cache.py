@@ -0,0 +1,51 @@
+"""
+Тести кешу відповідей: ключі, TTL та витіснення за кількістю записів і розміром.
+
+pytest test_response_cache.py
+"""
+import asyncio
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_case_is_ignored_only_in_mode_simple():
+    make_key = ResponseCache.make_key
+    assert make_key('mode_simple', 'i', 'm', 'київ  є') == make_key('mode_simple', 'i', 'm', 'Київ є')
+    assert make_key('mode_basic', 'i', 'm', 'київ') != make_key('mode_basic', 'i', 'm', 'Київ')
+    assert make_key('mode_full', 'i', 'm', 'Київ  є') == make_key('mode_full', 'i', 'm', 'Київ є')
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    cache = ResponseCache(ttl=60)
+    run(cache.set('a', 'value'))
+    assert run(cache.get('a')) == 'value'
+    now[0] += 61
+    assert run(cache.get('a')) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    run(cache.set('a', '1'))
+    run(cache.set('b', '2'))
+    assert run(cache.get('a')) == '1'
+    run(cache.set('c', '3'))
+    assert run(cache.get('b')) is None
+    assert run(cache.get('a')) == '1' and run(cache.get('c')) == '3'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_are_evicted_by_size_in_bytes():
+    cache = ResponseCache(max_bytes=10)
+    run(cache.set('a', 'ї' * 3))
+    run(cache.set('b', 'ї' * 3))
+    assert cache.stats()['bytes'] == 6
+    assert run(cache.get('a')) is None
+    assert run(cache.get('b')) == 'ї' * 3
@@ -0,0 +1,150 @@
+"""
+Тести та бенчмарк пам'яті сесій користувачів.
+
+pytest test_session_store.py     - тести Session, видалення сесій та сховища стану
+python test_session_store.py     - байтів на користувача: словник user_data проти Session
+"""
+import asyncio
+import copy
+import time
+import tracemalloc
+
+import pytest
+
+from persistence import RedisPersistence, SQLitePersistence
+from session_store import GrammarMode, Session, SessionEvictor
+
+
+def make_legacy_user_data(index: int, minigame: bool) -> dict:
+    """user_data у форматі попередніх версій бота (словник з рядковим режимом)"""
+    data = {'grammar_mode': 'mode_full', 'in_minigame': minigame}
+    if minigame:
+        data.update(
+            minigame_level='normal',
+            minigame_started_at=time.time(),
+            minigame_correct_answer=f'кіт сидить на теплому підвіконні номер {index}',
+            minigame_original=f'кит сидит на теплому підвіконі номер {index}',
+        )
+    return data
+
+
+def make_session(index: int, minigame: bool) -> Session:
+    session = Session()
+    session.grammar_mode = GrammarMode.FULL
+    if minigame:
+        session.start_minigame('normal')
+        session.minigame_correct_answer = f'кіт сидить на теплому підвіконні номер {index}'
+        session.minigame_original = f'кит сидит на теплому підвіконі номер {index}'
+    return session
+
+
+def test_session_round_trip_and_legacy_format():
+    session = make_session(1, minigame=True)
+    restored = Session.from_dict(session.to_dict())
+    assert restored.grammar_mode is GrammarMode.FULL
+    assert restored.in_minigame and restored.minigame_level == 'normal'
+    assert restored.minigame_original == session.minigame_original
+
+    # Старий запис: рядковий режим і залишки завершеної гри без in_minigame
+    legacy = {'grammar_mode': 'mode_basic', 'in_minigame': False, 'minigame_original': 'залишок'}
+    restored = Session.from_dict(legacy)
+    assert restored.grammar_mode is GrammarMode.BASIC
+    assert restored.minigame_original is None
+    assert Session.from_dict({'grammar_mode': 'unknown'}).grammar_mode is GrammarMode.SIMPLE
+
+
+def test_expire_minigame_frees_puzzle_strings():
+    session = make_session(1, minigame=True)
+    assert not session.expire_minigame(3600)
+    assert session.expire_minigame(3600, now=time.time() + 3601)
+    assert not session.in_minigame
+    assert session.minigame_correct_answer is None and session.minigame_original is None
+
+
+def test_deepcopy_is_independent():
+    session = make_session(1, minigame=True)
+    snapshot = copy.deepcopy(session)
+    session.end_minigame()
+    assert snapshot.in_minigame and snapshot.minigame_original is not None
+
+
+def test_evictor_drops_idle_then_oldest_over_cap():
+    now = time.time()
+    sessions = {}
+    for user_id, age in ((1, 10), (2, 500), (3, 20), (4, 30), (5, 5)):
+        sessions[user_id] = Session()
+        sessions[user_id].touch(now - age)
+    evictor = SessionEvictor(idle_ttl=100, max_sessions=2)
+    assert sorted(evictor.select(sessions, now)) == [2, 3, 4]
+    assert evictor.stats()['evicted_idle'] == 1
+    assert evictor.stats()['evicted_overflow'] == 2
+
+
+def test_sqlite_persistence_stores_sessions(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+
+    async def scenario():
+        persistence = SQLitePersistence(path)
+        await persistence.update_user_data(42, make_session(42, minigame=True))
+        await persistence.flush()
+        return await SQLitePersistence(path).get_user_data()
+
+    user_data = asyncio.run(scenario())
+    assert isinstance(user_data[42], Session)
+    assert user_data[42].grammar_mode is GrammarMode.FULL and user_data[42].in_minigame
+
+
+def test_sqlite_persistence_loads_only_own_shard(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+
+    async def scenario():
+        persistence = SQLitePersistence(path)
+        for user_id in range(10):
+            await persistence.update_user_data(user_id, make_session(user_id, minigame=False))
+        await persistence.flush()
+        return [await SQLitePersistence(path, shard=(index, 3)).get_user_data() for index in range(3)]
+
+    shards = asyncio.run(scenario())
+    assert sorted(shards[1]) == [1, 4, 7]
+    assert sorted(user_id for shard in shards for user_id in shard) == list(range(10))
+
+
+def test_redis_persistence_update_reload_and_drop():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeAsyncRedis()
+
+    async def scenario():
+        persistence = RedisPersistence(client=client, load_batch_size=2)
+        for user_id in range(5):
+            await persistence.update_user_data(user_id, make_session(user_id, minigame=user_id == 3))
+        await persistence.flush()
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+        return await RedisPersistence(client=client, load_batch_size=2).get_user_data()
+
+    user_data = asyncio.run(scenario())
+    assert sorted(user_data) == [0, 2, 3, 4]
+    assert isinstance(user_data[3], Session) and user_data[3].in_minigame
+    assert user_data[3].minigame_original == make_session(3, minigame=True).minigame_original
+
+
+def bytes_per_user(factory, users: int, minigame: bool) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = {user_id: factory(user_id, minigame) for user_id in range(users)}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(store) == users
+    return (after - before) / users
+
+
+def benchmark_memory(users: int = 100_000) -> None:
+    print(f"Пам'ять на одного користувача ({users} користувачів, разом з записом у user_data):")
+    for minigame, label in ((False, 'обраний режим'), (True, 'активна мінігра')):
+        legacy = bytes_per_user(make_legacy_user_data, users, minigame)
+        compact = bytes_per_user(make_session, users, minigame)
+        print(f"  {label:16} dict: {legacy:6.0f} байт, Session: {compact:6.0f} байт ({compact / legacy:.0%})")
+
+
+if __name__ == '__main__':
+    benchmark_memory()
@@ -0,0 +1,102 @@
+"""
+Тести швидкого старту та конфігурації.
+
+pytest test_startup.py     - bot імпортується без токенів і вкладається в бюджет часу імпорту
+python test_startup.py     - найповільніші модулі при імпорті bot (python -X importtime)
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from config import Config, ConfigError
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Бюджет сумарного часу імпорту bot у секундах; на повільних машинах можна збільшити через змінну оточення
+IMPORT_TIME_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', '0.8'))
+
+
+def import_times(module: str = 'bot') -> dict:
+    """Імпортує модуль в окремому процесі без токенів і повертає сумарний час імпорту (с) кожного модуля"""
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN='', OPENAI_API_KEY='')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=HERE, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        # Рядок заголовка не містить чисел
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+def test_bot_imports_without_tokens_and_without_openai():
+    times = import_times()
+    assert 'bot' in times
+    # Клієнт OpenAI створюється при першому запиті, а не при імпорті
+    assert 'openai' not in times
+
+
+def test_bot_import_time_within_budget():
+    # Найкращий з трьох запусків, щоб не залежати від випадкових затримок диска
+    best = min(import_times()['bot'] for _ in range(3))
+    assert best < IMPORT_TIME_BUDGET, f"імпорт bot триває {best:.3f}с, бюджет {IMPORT_TIME_BUDGET}с"
+
+
+def test_config_from_env_parses_types():
+    config = Config.from_env({
+        'WORKERS': '4',
+        'OPENAI_TIMEOUT': '12.5',
+        'OPENAI_HEDGING': 'true',
+        'OPENAI_BASE_URL': '',
+        'STREAMING_MODES': 'mode_basic, mode_full,',
+    })
+    assert config.workers == 4
+    assert config.openai_timeout == 12.5
+    assert config.openai_hedging is True
+    assert config.openai_base_url is None
+    assert config.streaming_modes == {'mode_basic', 'mode_full'}
+    assert config.concurrent_updates == Config().concurrent_updates
+
+
+def test_config_rejects_invalid_values_and_missing_tokens():
+    with pytest.raises(ConfigError, match='WORKERS'):
+        Config.from_env({'WORKERS': 'four'})
+    with pytest.raises(ConfigError, match='TELEGRAM_BOT_TOKEN'):
+        Config.from_env({'OPENAI_API_KEY': 'key'}).validate()
+    Config.from_env({'TELEGRAM_BOT_TOKEN': '1:token', 'OPENAI_API_KEY': 'key'}).validate()
+
+
+def test_config_rejects_malformed_allowed_user_ids():
+    tokens = {'TELEGRAM_BOT_TOKEN': '1:token', 'OPENAI_API_KEY': 'key'}
+    with pytest.raises(ConfigError, match='ALLOWED_USER_IDS'):
+        Config.from_env(dict(tokens, ALLOWED_USER_IDS='123, abc')).validate()
+    Config.from_env(dict(tokens, ALLOWED_USER_IDS='123, 456')).validate()
+
+
+def test_config_requires_webhook_secret_token():
+    tokens = {'TELEGRAM_BOT_TOKEN': '1:token', 'OPENAI_API_KEY': 'key', 'WEBHOOK_URL': 'https://bot.example.com'}
+    with pytest.raises(ConfigError, match='WEBHOOK_SECRET_TOKEN'):
+        Config.from_env(tokens).validate()
+    with pytest.raises(ConfigError, match='WEBHOOK_SECRET_TOKEN'):
+        Config.from_env(dict(tokens, WEBHOOK_SECRET_TOKEN='not allowed!')).validate()
+    Config.from_env(dict(tokens, WEBHOOK_SECRET_TOKEN='s3cret_token-1')).validate()
+
+
+def print_import_report(top: int = 10) -> None:
+    times = import_times()
+    print(f"Імпорт bot: {times['bot'] * 1000:.0f}мс (бюджет {IMPORT_TIME_BUDGET * 1000:.0f}мс)")
+    for name, seconds in sorted(times.items(), key=lambda item: item[1], reverse=True)[1:top + 1]:
+        print(f"  {name:40} {seconds * 1000:8.1f}мс")
+
+
+if __name__ == '__main__':
+    print_import_report()
@@ -0,0 +1,38 @@
+"""
+Тести розподілу оновлень між воркерами супервізора.
+
+pytest test_supervisor.py
+"""
+from telegram import Update
+
+from persistence import SQLitePersistence
+from supervisor import Supervisor
+from update_processor import chat_key, shard_key
+
+
+def make_update(update_id: int, chat_id: int, chat_type: str, user_id: int) -> Update:
+    return Update.de_json({'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'text': 'привіт',
+        'chat': {'id': chat_id, 'type': chat_type, 'title': 'група'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'U'},
+    }}, None)
+
+
+def test_group_chat_updates_go_to_the_worker_that_owns_the_user(tmp_path):
+    workers = 3
+    supervisor = Supervisor(workers)
+    persistences = [SQLitePersistence(str(tmp_path / 'state.sqlite3'), shard=(index, workers)) for index in range(workers)]
+    group = -100123456
+    for update_id, user_id in enumerate((10, 11, 12, 13), start=1):
+        update = make_update(update_id, group, 'supergroup', user_id)
+        index = supervisor.dispatch(update)
+        # Оновлення з групи обробляє воркер, який завантажує та зберігає сесію цього користувача
+        assert persistences[index].owns(user_id)
+        assert sum(persistence.owns(user_id) for persistence in persistences) == 1
+    assert supervisor.dispatched == [1, 2, 1]
+
+
+def test_private_chat_shard_key_matches_chat_key():
+    update = make_update(1, 42, 'private', 42)
+    assert shard_key(update) == chat_key(update) == 42
+    assert shard_key(make_update(2, -100, 'group', 7)) == 7
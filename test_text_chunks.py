@@ -0,0 +1,36 @@
+"""
+Тести розбиття довгих текстів: склеювання частин дає початковий текст, кожна частина не довша за ліміт.
+
+pytest test_text_chunks.py
+"""
+import pytest
+
+from text_chunks import split_message, split_text
+
+
+TEXTS = [
+    '',
+    'Коротке речення.',
+    'Перше речення. Друге речення! Третє? ' * 40,
+    'Абзац один.\n\nАбзац два з кількома словами.\n' * 30,
+    'дуже' * 500,
+    ' пробіли  на   краях ',
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+@pytest.mark.parametrize('max_chars', [1, 7, 50, 1000])
+def test_chunks_join_back_and_fit_the_limit(text, max_chars):
+    chunks = split_text(text, max_chars)
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+
+
+def test_long_text_is_split_on_sentence_boundaries():
+    chunks = split_text('Перше речення. Друге речення. Третє речення.', 20)
+    assert chunks == ['Перше речення.', ' Друге речення.', ' Третє речення.']
+
+
+def test_split_message_drops_empty_parts():
+    assert split_message('  \n\n  ', 4096) == []
+    assert split_message('Привіт', 4096) == ['Привіт']
@@ -0,0 +1,90 @@
+"""
+Тести webhook-сервера: перевірка секретного токена, розбір тіла запиту та сервер метрик.
+
+pytest test_webhook_server.py
+"""
+import asyncio
+import json
+import socket
+
+from tornado.httpclient import AsyncHTTPClient
+
+from webhook_server import SECRET_TOKEN_HEADER, build_web_app, start_metrics_server
+
+
+class FakeApplication:
+    """Мінімальна заміна Application: webhook-обробнику потрібні тільки bot та update_queue"""
+
+    bot = None
+    running = True
+
+    def __init__(self) -> None:
+        self.update_queue = asyncio.Queue()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def post_statuses(secret_token: str, requests: list) -> tuple:
+    """Запускає webhook-сервер і повертає (статуси відповідей, кількість оновлень у черзі)"""
+
+    async def scenario():
+        application = FakeApplication()
+        port = free_port()
+        server = build_web_app(application, '/telegram', secret_token).listen(port, address='127.0.0.1')
+        client = AsyncHTTPClient()
+        statuses = []
+        try:
+            for body, headers in requests:
+                response = await client.fetch(
+                    f'http://127.0.0.1:{port}/telegram', method='POST', body=body, headers=headers, raise_error=False,
+                )
+                statuses.append(response.code)
+        finally:
+            server.stop()
+        return statuses, application.update_queue.qsize()
+
+    return asyncio.run(scenario())
+
+
+UPDATE = json.dumps({'update_id': 1, 'message': {
+    'message_id': 1, 'date': 0, 'chat': {'id': 7, 'type': 'private'}, 'from': {'id': 7, 'is_bot': False, 'first_name': 'U'},
+    'text': 'привіт',
+}})
+
+
+def test_requests_without_valid_secret_token_are_rejected():
+    statuses, queued = post_statuses('secret', [
+        (UPDATE, {}),
+        (UPDATE, {SECRET_TOKEN_HEADER: 'wrong'}),
+        (UPDATE, {SECRET_TOKEN_HEADER: 'secret'}),
+    ])
+    assert statuses == [403, 403, 200]
+    assert queued == 1
+
+
+def test_missing_secret_token_rejects_everything():
+    statuses, queued = post_statuses('', [(UPDATE, {}), (UPDATE, {SECRET_TOKEN_HEADER: ''})])
+    assert statuses == [403, 403]
+    assert queued == 0
+
+
+def test_malformed_body_is_rejected_with_400():
+    headers = {SECRET_TOKEN_HEADER: 'secret'}
+    statuses, queued = post_statuses('secret', [('[1, 2]', headers), ('"text"', headers), ('{not json', headers)])
+    assert statuses == [400, 400, 400]
+    assert queued == 0
+
+
+def test_busy_metrics_port_does_not_stop_the_bot(caplog):
+    async def scenario():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen()
+            return start_metrics_server(sock.getsockname()[1])
+
+    assert asyncio.run(scenario()) is None
+    assert 'Не вдалося запустити сервер метрик' in caplog.text
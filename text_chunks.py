@@ -0,0 +1,49 @@
+"""
+Розбиття довгих текстів на частини по межах абзаців, речень та слів
+"""
+import re
+from typing import List
+
+
+# Межі в порядку пріоритету: рядки/абзаци, речення, слова.
+# Розбиття відбувається між символами, тому склеювання частин дає початковий текст.
+_BOUNDARIES = (
+    re.compile(r'(?<=\n)(?=[^\n])'),
+    re.compile(r'(?<=[.!?…])(?=\s)'),
+    re.compile(r'(?<=\s)(?=\S)'),
+)
+
+
+def _split_recursive(text: str, max_chars: int, level: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_BOUNDARIES):
+        # Одне «слово» довше за ліміт - ріжемо як є
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    pieces = []
+    for piece in _BOUNDARIES[level].split(text):
+        if piece:
+            pieces.extend(_split_recursive(piece, max_chars, level + 1))
+    return pieces
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Ділить текст на частини не довші за max_chars, зберігаючи всі символи та порядок"""
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = ''
+    for piece in _split_recursive(text, max_chars, 0):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_message(text: str, limit: int = 4096) -> List[str]:
+    """Ділить відповідь на повідомлення Telegram, пропускаючи порожні частини"""
+    return [part for part in (chunk.strip() for chunk in split_text(text, limit)) if part]
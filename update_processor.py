@@ -0,0 +1,82 @@
+"""
+Обробка оновлень паралельно для різних чатів, але строго по черзі в межах одного чату
+"""
+import asyncio
+from typing import Any, Awaitable, Dict, List
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def chat_key(update: object) -> int:
+    """Ключ впорядкування: id чату, інакше id користувача, інакше 0"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+    return 0
+
+
+def shard_key(update: object) -> int:
+    """
+    Ключ шардування між воркерами: id користувача, інакше id чату, інакше 0.
+
+    Стан зберігається за user_id, тому оновлення користувача (і в групі теж) мають потрапляти
+    до воркера, якому належить його сесія; в приватному чаті ключ збігається з chat_key.
+    """
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return 0
+
+
+# Ліміт семафора PTB: PTB тримає його слот і під час очікування блокування чату, тому
+# справжній ліміт застосовується всередині do_process_update, коли черга чату вже дійшла
+_PTB_LIMIT = 1 << 30
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    До max_concurrent_updates оновлень обробляються одночасно, але оновлення одного чату
+    виконуються в порядку надходження: наступне чекає, поки завершиться попереднє.
+
+    Місце в ліміті одночасних оновлень займається тільки після блокування чату, тому
+    оновлення, що чекають свого чату (наприклад, флуд з одного чату), не заважають іншим чатам.
+    """
+
+    __slots__ = ('_chats', '_running')
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(_PTB_LIMIT)
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # id чату -> [блокування, кількість оновлень чату в обробці або в очікуванні]
+        self._chats: Dict[int, List[Any]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = chat_key(update)
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[key]
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._chats)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
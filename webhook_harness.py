@@ -0,0 +1,162 @@
+"""
+Скрипт для навантажувального тестування webhook: надсилає синтетичні оновлення на локальний сервер.
+
+З --telegram-stub-port скрипт також піднімає заглушку Bot API (бот запускається з
+TELEGRAM_API_BASE_URL=http://127.0.0.1:<порт>/bot) і чекає, поки бот відповість на всі
+оновлення, щоб виміряти пропускну здатність обробки, а не тільки прийому.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+import httpx
+import tornado.web
+
+from webhook_server import SECRET_TOKEN_HEADER
+
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Grammar Bot', 'username': 'grammar_harness_bot'}
+
+
+class BotAPIStubHandler(tornado.web.RequestHandler):
+    """Заглушка Bot API: рахує виклики методів і відповідає успіхом"""
+
+    def initialize(self, calls: Counter) -> None:
+        self.calls = calls
+
+    def post(self, token: str, method: str) -> None:
+        self.calls[method] += 1
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id = int(self.get_body_argument('chat_id', '0'))
+            result = {
+                'message_id': self.calls[method],
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': self.get_body_argument('text', ''),
+            }
+        else:
+            result = True
+        self.write({'ok': True, 'result': result})
+
+
+def start_bot_api_stub(port: int, calls: Counter):
+    return tornado.web.Application([
+        (r'/bot([^/]+)/(\w+)', BotAPIStubHandler, {'calls': calls}),
+    ]).listen(port, address='127.0.0.1')
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, url: str, timeout: float) -> None:
+    """Бот стартує тільки після відповіді заглушки Bot API, тому чекаємо на його /healthz"""
+    health_url = str(httpx.URL(url).copy_with(path='/healthz'))
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get(health_url)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"{health_url} не відповідає")
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Синтетичне оновлення з текстовим повідомленням від користувача"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': text,
+        },
+    }
+
+
+async def run(
+    url: str,
+    secret_token: str,
+    total: int,
+    rate: float,
+    users: int,
+    text: str,
+    telegram_stub_port: int = 0,
+    wait_timeout: float = 120.0,
+) -> None:
+    headers = {SECRET_TOKEN_HEADER: secret_token} if secret_token else {}
+    statuses = Counter()
+    calls = Counter()
+    if telegram_stub_port:
+        start_bot_api_stub(telegram_stub_port, calls)
+    replies_before = calls['sendMessage']
+    latencies = []
+    update_ids = itertools.count(1)
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        if telegram_stub_port:
+            await wait_until_healthy(client, url, wait_timeout)
+
+        async def send_one(update_id: int) -> None:
+            payload = make_message_update(update_id, 100000 + update_id % users, text)
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload, headers=headers)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        tasks = []
+        for _ in range(total):
+            tasks.append(asyncio.create_task(send_one(next(update_ids))))
+            if rate > 0:
+                await asyncio.sleep(1 / rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    if telegram_stub_port:
+        # Кожне оновлення з текстом дає одну відповідь sendMessage
+        deadline = time.perf_counter() + wait_timeout
+        while calls['sendMessage'] - replies_before < total and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        processed = calls['sendMessage'] - replies_before
+        processing_elapsed = time.perf_counter() - started
+        print(
+            f"Оброблено оновлень: {processed} з {total} за {processing_elapsed:.2f}с "
+            f"({processed / processing_elapsed:.1f} оновлень/с)"
+        )
+
+    latencies.sort()
+    print(f"Надіслано оновлень: {total} за {elapsed:.2f}с ({total / elapsed:.1f} оновлень/с)")
+    print(f"Статуси відповідей: {dict(statuses)}")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"Затримка: p50 {p50 * 1000:.1f}мс, p99 {p99 * 1000:.1f}мс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram')
+    parser.add_argument('--secret-token', default='')
+    parser.add_argument('--total', type=int, default=1000, help='кількість оновлень')
+    parser.add_argument('--rate', type=float, default=0, help='оновлень за секунду (0 - без обмеження)')
+    parser.add_argument('--users', type=int, default=100, help='кількість різних користувачів')
+    parser.add_argument('--text', default='Привіт, як справи')
+    parser.add_argument('--telegram-stub-port', type=int, default=0, help='порт заглушки Bot API (0 - не запускати)')
+    parser.add_argument('--wait-timeout', type=float, default=120, help='скільки чекати відповідей бота')
+    args = parser.parse_args()
+    asyncio.run(run(
+        args.url, args.secret_token, args.total, args.rate, args.users, args.text,
+        args.telegram_stub_port, args.wait_timeout,
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Webhook-сервер для бота як альтернатива run_polling
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from typing import List, Optional
+
+import tornado.web
+from telegram import Update
+from telegram.ext import Application
+
+from metrics import REGISTRY
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class TelegramWebhookHandler(tornado.web.RequestHandler):
+    """
+    Приймає оновлення від Telegram та передає їх у чергу Application.
+
+    Без перевірки секретного токена будь-хто, хто знає адресу, міг би надіслати оновлення
+    з чужим from.id і обійти список дозволених користувачів, тому запити без правильного
+    токена відхиляються завжди (а без налаштованого токена - всі).
+    """
+
+    def initialize(self, bot_application: Application, secret_token: str) -> None:
+        self.bot_application = bot_application
+        self.secret_token = secret_token
+
+    async def post(self) -> None:
+        received = self.request.headers.get(SECRET_TOKEN_HEADER, '')
+        if not self.secret_token or not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+            logger.warning(f"Webhook-запит з невірним секретним токеном від {self.request.remote_ip}")
+            raise tornado.web.HTTPError(403)
+
+        try:
+            data = json.loads(self.request.body)
+            if not isinstance(data, dict):
+                raise ValueError(f"очікується JSON-об'єкт, отримано {type(data).__name__}")
+            update = Update.de_json(data, self.bot_application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Не вдалося розібрати webhook-оновлення: {e}")
+            raise tornado.web.HTTPError(400)
+
+        await self.bot_application.update_queue.put(update)
+        self.set_status(200)
+
+    def log_exception(self, typ, value, tb) -> None:
+        # HTTPError 403/400 вже залоговано вище
+        if not isinstance(value, tornado.web.HTTPError):
+            super().log_exception(typ, value, tb)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """Перевірка стану для балансувальника навантаження"""
+
+    def initialize(self, bot_application: Application) -> None:
+        self.bot_application = bot_application
+
+    def get(self) -> None:
+        running = self.bot_application.running
+        self.set_status(200 if running else 503)
+        self.write({
+            'status': 'ok' if running else 'stopped',
+            'update_queue': self.bot_application.update_queue.qsize(),
+        })
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Метрики у текстовому форматі Prometheus"""
+
+    def get(self) -> None:
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(REGISTRY.render())
+
+
+def build_web_app(application: Application, path: str, secret_token: str) -> tornado.web.Application:
+    """
+    Створює tornado-додаток з webhook-ендпоінтом та /healthz. Webhook-сервер зазвичай
+    доступний з інтернету, тому /metrics тут немає: метрики віддає start_metrics_server.
+    """
+    return tornado.web.Application([
+        (path, TelegramWebhookHandler, {'bot_application': application, 'secret_token': secret_token}),
+        (r'/healthz', HealthHandler, {'bot_application': application}),
+    ])
+
+
+def start_metrics_server(port: int, listen: str = '127.0.0.1'):
+    """
+    Запускає окремий HTTP-сервер з /metrics (за замовчуванням тільки на localhost).
+    Якщо порт зайнятий, бот працює далі без метрик; повертає None.
+    """
+    try:
+        server = tornado.web.Application([(r'/metrics', MetricsHandler)]).listen(port, address=listen)
+    except OSError as e:
+        logger.error(f"Не вдалося запустити сервер метрик на {listen}:{port}: {e}. Бот працює без /metrics.")
+        return None
+    logger.info(f"Метрики доступні на http://{listen}:{port}/metrics")
+    return server
+
+
+async def run_webhook(
+    application: Application,
+    url: str,
+    listen: str = '0.0.0.0',
+    port: int = 8443,
+    path: str = '/telegram',
+    secret_token: str = '',
+    allowed_updates: Optional[List[str]] = None,
+) -> None:
+    """Запускає бота в режимі webhook до отримання SIGINT/SIGTERM; secret_token обов'язковий"""
+    if not secret_token:
+        raise ValueError("Режим webhook потребує секретного токена")
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows не підтримує add_signal_handler
+            pass
+
+    web_app = build_web_app(application, path, secret_token)
+
+    async with application:
+        # Як і run_polling у PTB, викликаємо post_init після ініціалізації (там запускаються метрики)
+        if application.post_init is not None:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=url.rstrip('/') + path,
+            secret_token=secret_token,
+            allowed_updates=allowed_updates,
+        )
+        await application.start()
+        server = web_app.listen(port, address=listen)
+        logger.info(f"Webhook-сервер слухає {listen}:{port}{path} (перевірка стану: /healthz)")
+        try:
+            await stop_event.wait()
+        finally:
+            server.stop()
+            await application.stop()